@@ -0,0 +1,304 @@
+"""
+Artists
+Matplotlib artists used by RulerCompassAnimations to draw the steps of a
+construction more cheaply than the general-purpose ones.
+
+Copyright (C) 2019 Sam Hartburn
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+author: Sam Hartburn
+email: sam@samhartburn.co.uk
+website: www.samhartburn.co.uk
+"""
+
+"""
+RulerCompassAnimations only imports this module when it first makes the
+artists for a scene, as importing it imports matplotlib.
+
+LineBatches draws the lines of a scene made with Scene(collections=True): each
+line step gets a BatchedLine, which has the methods of Line2D that Animatable
+and Schedule use, and the lines are drawn by a few LineCollections, one set for
+each combination of colour, width and line style that is on show. Drawing then
+costs a draw call for each of those rather than one for each line.
+
+ArtistPool keeps the artists of a scene made with Scene(pooled=True) that
+steps have finished with, for later steps to use.
+"""
+
+import math
+import numpy as np
+import matplotlib
+from matplotlib import patches
+from matplotlib import transforms
+from matplotlib import colors
+from matplotlib.collections import LineCollection
+from matplotlib.path import Path
+
+#Degrees between the vertices of unitArc. An arc's end is within half of this of where it should
+#be, which is under a pixel for any arc that fits in a figure
+degreesPerVertex = 0.1
+
+#Vertices of the unit circle, anticlockwise from the x-axis, one every degreesPerVertex degrees
+#and all the way round
+unitArc = np.array([[math.cos(math.radians(i*degreesPerVertex)), math.sin(math.radians(i*degreesPerVertex))]
+                    for i in range(int(round(360/degreesPerVertex))+1)])
+unitArc.flags.writeable = False
+
+#Path of the first count vertices of unitArc, for each count that has been drawn. They're shared
+#by every UnitArc, and don't copy the vertices
+arcPaths = {}
+
+def arcPath(count):
+    path = arcPaths.get(count)
+    if (path is None):
+        path = arcPaths[count] = Path(unitArc[:count], readonly=True)
+    return path
+
+#A circular arc, drawn the same way as matplotlib.patches.Arc(centre, 2*radius, 2*radius,
+#rotation, theta1, theta2): anticlockwise from theta1 to theta2 degrees, measured from rotation
+#degrees. Instead of making a new path each time it's drawn, it's the start of unitArc, rotated,
+#scaled and moved into place by its transform, which only changes when setAngles is called
+class UnitArc(patches.Patch):
+    def __init__(self, centre, radius, rotation, theta1, theta2, **kwargs):
+        kwargs.setdefault('fill', False)
+        super().__init__(**kwargs)
+        self.centre = centre
+        self.radius = radius
+        self.rotation = rotation
+        self.arcTransform = transforms.Affine2D()
+        self.setAngles(theta1, theta2)
+
+    #Show the arc from theta1 to theta2. As with Arc, theta2 is taken round to within 360 degrees
+    #after theta1, and the arc is empty if they're the same
+    def setAngles(self, theta1, theta2):
+        self.theta1 = theta1
+        self.theta2 = theta2
+        sweep = (theta2-theta1)%360
+        if (sweep==0 and theta2!=theta1):
+            sweep = 360
+        self.path = arcPath(int(round(sweep/degreesPerVertex))+1)
+        self.arcTransform.clear().rotate_deg(self.rotation+theta1).scale(self.radius).translate(*self.centre)
+        self.stale = True
+
+    #Move the arc onto another circle, for a step that reuses it. setAngles has to be called
+    #afterwards for the arc to be drawn there
+    def setCircle(self, centre, radius, rotation):
+        self.centre = centre
+        self.radius = radius
+        self.rotation = rotation
+        
+    def get_path(self):
+        return self.path
+
+    def get_patch_transform(self):
+        return self.arcTransform
+
+#Most lines drawn by one LineCollection. set_segments makes a new path for every segment of a
+#collection, so a big construction's lines are shared between several collections of this size
+#to keep a change to one line from remaking the paths of all the others in its style
+segmentsPerCollection = 256
+
+#A LineCollection drawing the lines in one style. The segments of the lines in it are kept in
+#segments, with the line in slot i at segments[i]; the slots from count on are free
+class LineGroup:
+    def __init__(self, ax, key):
+        colour, width, linestyle = key
+        self.key = key
+        self.segments = np.zeros((segmentsPerCollection, 2, 2))
+        self.lines = []
+        #Line2D ends solid lines with projecting caps and dashed ones with butt caps
+        capstyle = 'projecting' if linestyle in ('-', 'solid') else 'butt'
+        self.collection = LineCollection([], colors=[colour], linewidths=[width], linestyles=linestyle,
+                                         capstyle=capstyle)
+        ax.add_collection(self.collection, autolim=False)
+        
+    def full(self):
+        return len(self.lines)==segmentsPerCollection
+        
+    def add(self, line):
+        line.group = self
+        line.slot = len(self.lines)
+        self.lines.append(line)
+        self.write(line)
+        
+    #Take line out, moving the last line and its segment into its slot
+    def discard(self, line):
+        last = self.lines.pop()
+        if (last is not line):
+            self.segments[line.slot] = self.segments[last.slot]
+            last.slot = line.slot
+            self.lines[last.slot] = last
+        line.group = None
+        line.slot = None
+        
+    def write(self, line):
+        x, y = line.data
+        self.segments[line.slot, :, 0] = x
+        self.segments[line.slot, :, 1] = y
+        
+    def update(self):
+        self.collection.set_segments(self.segments[:len(self.lines)])
+
+#The lines of one axes, drawn by LineGroups. Changes to the lines are only passed on to the
+#groups when flush is called, so that setting a line's colour, width and style one after the
+#other only moves it between groups once
+class LineBatches:
+    def __init__(self, ax):
+        self.ax = ax
+        self.groups = {}
+        self.pending = set()
+        #Groups that lines have been removed from since the last flush
+        self.dirty = {}
+        
+    def line(self):
+        return BatchedLine(self)
+    
+    #Every LineCollection, in the order they're drawn
+    def collections(self):
+        return [group.collection for groups in self.groups.values() for group in groups]
+        
+    #Put the lines that have changed since the last flush into the group for their style, or
+    #take them out if they can't be seen
+    #Returns the LineCollections that have changed
+    def flush(self):
+        dirty = self.dirty
+        self.dirty = {}
+        for line in self.pending:
+            key = line.key()
+            group = line.group
+            if (group is not None and group.key==key):
+                group.write(line)
+                dirty[id(group)] = group
+                continue
+            if (group is not None):
+                group.discard(line)
+                dirty[id(group)] = group
+            if (key is not None):
+                group = self.groupFor(key)
+                group.add(line)
+                dirty[id(group)] = group
+        self.pending.clear()
+        for group in dirty.values():
+            group.update()
+        return [group.collection for group in dirty.values()]
+    
+    def groupFor(self, key):
+        groups = self.groups.setdefault(key, [])
+        for group in groups:
+            if (not group.full()):
+                return group
+        group = LineGroup(self.ax, key)
+        groups.append(group)
+        return group
+    
+    #Remove every collection from the axes
+    def remove(self):
+        for collection in self.collections():
+            collection.remove()
+        self.groups = {}
+        self.pending.clear()
+        self.dirty = {}
+
+#Stands in for the Line2D of a line step, drawn by a LineGroup of batches. It's only drawn while
+#it's visible and has a segment
+class BatchedLine:
+    __slots__ = ('batches', 'data', 'colour', 'width', 'linestyle', 'visible', 'group', 'slot')
+    
+    def __init__(self, batches):
+        self.batches = batches
+        self.data = None
+        self.colour = None
+        self.width = None
+        self.linestyle = None
+        self.visible = True
+        self.group = None
+        self.slot = None
+        
+    #The style of the group to draw the line in, or None if it isn't drawn
+    def key(self):
+        if (not self.visible or self.data is None):
+            return None
+        width = self.width if self.width is not None else matplotlib.rcParams['lines.linewidth']
+        linestyle = self.linestyle if self.linestyle is not None else matplotlib.rcParams['lines.linestyle']
+        colour = self.colour if self.colour is not None else matplotlib.rcParams['axes.prop_cycle'].by_key()['color'][0]
+        if (isinstance(linestyle, list)):
+            linestyle = tuple(linestyle)
+        return (colors.to_rgba(colour), width, linestyle)
+        
+    def changed(self):
+        self.batches.pending.add(self)
+        
+    def set_data(self, x, y):
+        self.data = (x, y) if len(x)>0 else None
+        self.changed()
+        
+    def set_color(self, colour):
+        self.colour = colour
+        self.changed()
+        
+    def set_linestyle(self, linestyle):
+        self.linestyle = linestyle
+        self.changed()
+        
+    def set_linewidth(self, width):
+        self.width = width
+        self.changed()
+        
+    def set_visible(self, visible):
+        self.visible = visible
+        self.changed()
+        
+    def get_visible(self):
+        return self.visible
+    
+    #The collections are what's drawn, so there's nothing to do
+    def set_animated(self, animated):
+        pass
+    
+    def remove(self):
+        if (self.group is not None):
+            self.batches.dirty[id(self.group)] = self.group
+            self.group.discard(self)
+        self.batches.pending.discard(self)
+
+#Artists that steps have finished with, hidden but left on the axes, so that later steps can take
+#them instead of making new ones. They're kept by their class, as a step can only use an artist
+#of the class it would make. The axes then only hold as many artists as there have been steps on
+#show at once, however long the construction is
+class ArtistPool:
+    def __init__(self, ax):
+        self.ax = ax
+        self.idle = {}
+        
+    #An idle artist of class kind, or None if there aren't any
+    def take(self, kind):
+        artists = self.idle.get(kind)
+        if (artists):
+            return artists.pop()
+        return None
+    
+    def give(self, artist):
+        artist.set_visible(False)
+        self.idle.setdefault(type(artist), []).append(artist)
+        
+    #Every idle artist
+    def artists(self):
+        return [artist for artists in self.idle.values() for artist in artists]
+    
+    #Remove every idle artist from the axes
+    def remove(self):
+        for artist in self.artists():
+            artist.remove()
+        self.idle = {}
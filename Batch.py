@@ -0,0 +1,237 @@
+"""
+Batch
+Render the square construction for every polygon in a manifest file, sharing
+the jobs between several processes.
+
+Copyright (C) 2019 Sam Hartburn
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+author: Sam Hartburn
+email: sam@samhartburn.co.uk
+website: www.samhartburn.co.uk
+"""
+
+"""
+The manifest is either a JSONL file with one job per line, for example
+{"type": "squareTriangle", "points": [[0,0],[5,1],[1,3]], "name": "triangle"}
+where name is optional, or a CSV file with one job per row, the construction
+type followed by the x and y of each point:
+squareTriangle,0,0,5,1,1,3
+The type is squareRectangle, squareTriangle, squarePolygon or squarePolygonTree, which
+combines the squares of the triangles in a balanced tree to keep big polygons short.
+
+Usage: python Batch.py manifest.jsonl [--output folder] [--format mp4|gif|png] [--cache folder]
+                       [--processes n] [--dpi dpi] [--fps fps] [--duration seconds]
+                       [--max-frames n] [--collections] [--pooled]
+                       [--summary summary.json]
+"""
+
+import os
+import csv
+import json
+import time
+import argparse
+import traceback
+import multiprocessing
+import numpy as np
+import matplotlib
+import RulerCompassAnimations as rc
+import SquarePolygons as poly
+import Export
+
+initialColor = (0,0.45,0.7,0.8)
+
+#The settings every job is rendered with, set by renderBatch before the workers are forked
+batchSettings = None
+
+#Read the jobs in a JSONL or CSV manifest
+#Returns a list of dictionaries with type, points (a list of [x,y]) and name
+def readManifest(filename):
+    jobs = []
+    with open(filename, newline='') as f:
+        if (filename.lower().endswith('.csv')):
+            for row in csv.reader(f):
+                row = [value.strip() for value in row]
+                if (len(row)==0 or row[0]=='' or row[0].startswith('#')):
+                    continue
+                jobs.append({'type': row[0], 'points': [row[i:i+2] for i in range(1, len(row), 2)]})
+        else:
+            for line in f:
+                if (line.strip()!=''):
+                    jobs.append(json.loads(line))
+    for i, job in enumerate(jobs):
+        job.setdefault('name', 'job'+str(i).zfill(len(str(len(jobs)-1))))
+    return jobs
+
+#Most a corner of a squareRectangle can be away from a right angle, in degrees
+rightAngleTolerance = 0.5
+
+#Check that points make a shape that a construction of type can be made from, raising ValueError
+#if they don't. Every vertex is checked at once with the vectorised geometry functions
+def checkPoints(type, points):
+    vertices = rc.PointArray.fromPoints(points)
+    before = vertices.roll(1)
+    after = vertices.roll(-1)
+    edges = rc.distancesBetweenPoints(vertices, after)
+    if (np.any(edges==0)):
+        raise ValueError(type+' has the same point twice in a row')
+    #a vertex in line with its neighbours makes no triangle, so if they all are there's no area
+    if (np.all(rc.heightsOfTriangles(before, vertices, after)<=1e-9*edges.max())):
+        raise ValueError('The points of '+type+' are all in a line')
+    if (type=='squareRectangle'):
+        angles = rc.anglesThreePoints(before, vertices, after)
+        if (np.any(np.abs(angles-90)>rightAngleTolerance)):
+            raise ValueError('squareRectangle needs a rectangle, but its corners are '+
+                             ', '.join(format(angle, '.1f') for angle in angles)+' degrees')
+
+#Create the animations for one job, the same way as Main.py
+#If cache is a folder, the construction is loaded from it if it's been built before, and
+#saved in it if not
+def buildConstruction(type, points, cache=None):
+    points = [rc.Point(float(p[0]), float(p[1])) for p in points]
+    if (type=='squareRectangle' and len(points)!=4):
+        raise ValueError('squareRectangle needs 4 points, not '+str(len(points)))
+    if (type=='squareTriangle' and len(points)!=3):
+        raise ValueError('squareTriangle needs 3 points, not '+str(len(points)))
+    if (type in ('squarePolygon', 'squarePolygonTree') and len(points)<3):
+        raise ValueError(type+' needs at least 3 points, not '+str(len(points)))
+    if (type not in poly.constructions):
+        raise ValueError('Unknown construction type '+str(type))
+    checkPoints(type, points)
+
+    if (cache is not None):
+        square = poly.cachedConstruction(type, points, 1, cache)
+    elif (type in ('squarePolygon', 'squarePolygonTree')):
+        square = poly.constructions[type](*points, i_start=1)
+    else:
+        square = poly.constructions[type](*points, 1)
+
+    animations = [rc.addStepPolygon(points, initialColor, True, 0)]
+    animations[-1].setStyle(rc.Style(stdLineStyle='-',stdFaceColour=initialColor))
+    animations.extend(square[0])
+    return animations
+
+#Set up the shared figure once, drawing it so that fonts and the renderer are ready before
+#the workers are forked from this process
+def warmUp(scene, dpi):
+    scene.ax.axes.set_aspect('equal')
+    scene.fig.tight_layout()
+    scene.fig.set_dpi(dpi)
+    scene.fig.canvas.draw()
+
+#Render one job of the batch to the output folder
+#Runs in a worker process. Returns a record of how it went, with the error instead of raising it
+def renderJob(index, job):
+    scene, folder, format, dpi, fps, cache, duration, maxFrames = batchSettings
+    result = {'index': index, 'name': job.get('name'), 'type': job.get('type'), 'output': None,
+              'frames': None, 'seconds': None, 'error': None}
+    start = time.perf_counter()
+    try:
+        animations = scene.build(buildConstruction, job['type'], job['points'], cache)
+        if (duration is not None or maxFrames is not None):
+            rc.fitTimeline(animations, duration, maxFrames, fps)
+        result['frames'] = animations[-1].i_max+1
+        filename = os.path.join(folder, result['name'])
+        if (format=='mp4'):
+            result['output'] = filename+'.mp4'
+            Export.saveMP4(scene.fig, animations, result['output'], processes=1, fps=fps, dpi=dpi)
+        elif (format=='gif'):
+            result['output'] = filename+'.gif'
+            Export.saveGIF(scene.fig, animations, result['output'], fps=fps, dpi=dpi)
+        else:
+            result['output'] = Export.saveFrames(scene.fig, animations, [animations[-1].i_max], filename, dpi=dpi)[0]
+    except Exception:
+        result['error'] = traceback.format_exc()
+    finally:
+        #remove everything the job added, so the next job starts from an empty figure
+        scene.clear()
+    result['seconds'] = time.perf_counter()-start
+    return result
+
+#Render every job in the manifest as an MP4, GIF or PNG of the final frame in folder
+#processes is the number of worker processes, defaulting to one per core. A job that fails is
+#reported in the summary and doesn't stop the others
+#The summary, with the time taken by each job and the jobs per second, is written to summary
+#(defaulting to summary.json in folder) and returned
+#cache is a folder to keep built constructions in, so that rendering the same one again
+#doesn't build it again
+#duration and maxFrames limit the length of each render, as in rc.fitTimeline, so that big
+#polygons don't take much longer to render than small ones
+#collections=True draws the lines in LineCollections, and pooled=True only gives steps artists
+#while they can be seen, as in rc.Scene
+def renderBatch(manifest, folder='.', format='mp4', processes=None, dpi=None, fps=5, summary=None, cache=None,
+                duration=None, maxFrames=None, collections=False, pooled=False):
+    global batchSettings
+
+    if (processes is None):
+        processes = os.cpu_count()
+    #the scene is drawn on an Agg canvas, so the workers never start a GUI
+    scene = rc.Scene(collections=collections, pooled=pooled)
+    scene.setUp()
+    if (dpi is None):
+        dpi = matplotlib.rcParams['savefig.dpi']
+    if (summary is None):
+        summary = os.path.join(folder, 'summary.json')
+    jobs = readManifest(manifest)
+    os.makedirs(folder, exist_ok=True)
+    processes = max(1, min(processes, len(jobs)))
+    if ('fork' not in multiprocessing.get_all_start_methods()):
+        processes = 1
+
+    start = time.perf_counter()
+    warmUp(scene, dpi)
+    batchSettings = (scene, folder, format, dpi, fps, cache, duration, maxFrames)
+    try:
+        if (processes>1):
+            with multiprocessing.get_context('fork').Pool(processes) as pool:
+                results = pool.starmap(renderJob, enumerate(jobs), chunksize=1)
+        else:
+            results = [renderJob(i, job) for i, job in enumerate(jobs)]
+    finally:
+        batchSettings = None
+    seconds = time.perf_counter()-start
+
+    failed = [result for result in results if result['error'] is not None]
+    report = {'manifest': manifest, 'format': format, 'processes': processes, 'jobs': len(jobs),
+              'succeeded': len(jobs)-len(failed), 'failed': len(failed), 'seconds': seconds,
+              'jobsPerSecond': len(jobs)/seconds if seconds>0 else None, 'results': results}
+    with open(summary, 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+if (__name__=='__main__'):
+    parser = argparse.ArgumentParser(description='Render the square construction for every polygon in a manifest')
+    parser.add_argument('manifest', help='JSONL or CSV file of constructions to render')
+    parser.add_argument('--output', default='.', help='folder to save the renders and summary in')
+    parser.add_argument('--format', default='mp4', choices=['mp4', 'gif', 'png'])
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--dpi', type=float, default=None)
+    parser.add_argument('--fps', type=float, default=5)
+    parser.add_argument('--summary', default=None, help='file to write the summary to')
+    parser.add_argument('--cache', default=None, help='folder to save built constructions in and load them from')
+    parser.add_argument('--duration', type=float, default=None, help='seconds each render should last')
+    parser.add_argument('--max-frames', type=int, default=None, help='most frames each render can have')
+    parser.add_argument('--collections', action='store_true', help='draw the lines in a few LineCollections')
+    parser.add_argument('--pooled', action='store_true', help='reuse the artists of hidden steps')
+    args = parser.parse_args()
+
+    report = renderBatch(args.manifest, args.output, args.format, args.processes, args.dpi, args.fps, args.summary, args.cache,
+                         args.duration, args.max_frames, args.collections, args.pooled)
+    for result in report['results']:
+        if (result['error'] is not None):
+            print('Job', result['index'], result['name'], 'failed:')
+            print(result['error'])
+    print(report['succeeded'], 'of', report['jobs'], 'jobs rendered in', round(report['seconds'], 2),
+          'seconds,', round(report['jobsPerSecond'] or 0, 3), 'jobs per second')
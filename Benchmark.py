@@ -0,0 +1,348 @@
+"""
+Benchmark
+Timings for the RulerCompassAnimations and SquarePolygons libraries, checked
+against targets.
+
+Copyright (C) 2019 Sam Hartburn
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+author: Sam Hartburn
+email: sam@samhartburn.co.uk
+website: www.samhartburn.co.uk
+"""
+
+import os
+import gc
+import sys
+import json
+import math
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+
+folder = os.path.dirname(os.path.abspath(__file__))
+
+#Seconds that importing RulerCompassAnimations and SquarePolygons should take at most. It used
+#to take about 0.7s, nearly all of it starting matplotlib; now it's mostly NumPy
+importTarget = 0.3
+
+#Run in a new interpreter to time the import, then build a construction and check that neither
+#imported matplotlib
+importCode = '''
+import sys, time, json
+sys.path.insert(0, sys.argv[1])
+start = time.perf_counter()
+import RulerCompassAnimations as rc
+import SquarePolygons as poly
+seconds = time.perf_counter()-start
+importedMatplotlib = 'matplotlib' in sys.modules
+poly.squareTriangle(rc.Point(0,0), rc.Point(5,1), rc.Point(1,3), 1)
+builtWithMatplotlib = 'matplotlib' in sys.modules
+print(json.dumps([seconds, importedMatplotlib, builtWithMatplotlib]))
+'''
+
+#Time importing the libraries in a fresh interpreter repeats times, from a folder other than
+#this one so that it doesn't rely on the working directory
+#Returns the fastest time and whether matplotlib was imported by the import or by building
+def importTime(repeats=5):
+    times = []
+    matplotlib = False
+    with tempfile.TemporaryDirectory() as cwd:
+        for i in range(repeats):
+            output = subprocess.run([sys.executable, '-c', importCode, folder], cwd=cwd, check=True,
+                                    stdout=subprocess.PIPE, universal_newlines=True).stdout
+            seconds, importedMatplotlib, builtWithMatplotlib = json.loads(output)
+            times.append(seconds)
+            matplotlib = matplotlib or importedMatplotlib or builtWithMatplotlib
+    return min(times), matplotlib
+
+#Check the import against importTarget, printing the result
+#Returns True if it's fast enough and didn't need matplotlib
+def checkImport(target=importTarget):
+    seconds, matplotlib = importTime()
+    passed = seconds<=target and not matplotlib
+    print('import', round(seconds, 3), 's (target', target, 's),',
+          'matplotlib imported' if matplotlib else 'matplotlib not imported', '-', 'pass' if passed else 'FAIL')
+    return passed
+
+#The shapes the suite is run on: the rectangle and triangle from Main.py, and regular polygons
+#with each number of sides in polygonSizes
+polygonSizes = [5, 10, 20, 50, 100, 200, 500]
+rectangle = [[0,2], [5,2], [5,0], [0,0]]
+triangle = [[0,0], [5,1], [1,3]]
+
+#Settings for the suite. Drawing and exporting every size at full resolution would take hours,
+#so frames are drawn at a low dpi, only renderFrames frames spread over the construction are
+#drawn to measure the frame rate, and only shapes with up to exportSides sides are exported
+settings = {'repeats': 3, 'dpi': 50, 'renderFrames': 50, 'exportSides': 5, 'fps': 25}
+
+#The points of a regular polygon with n sides, all the same size as the shapes in Main.py
+def regularPolygon(n, radius=3):
+    return [[radius*math.cos(2*math.pi*i/n), radius*math.sin(2*math.pi*i/n)] for i in range(n)]
+
+#The points of a concave polygon with n vertices: a circle with seven bumps round it
+def concavePolygon(n, radius=3):
+    points = []
+    for i in range(n):
+        angle = 2*math.pi*i/n
+        r = radius*(1+0.25*math.sin(7*angle))
+        points.append([r*math.cos(angle), r*math.sin(angle)])
+    return points
+
+#The cases the suite is run on, as (name, construction type, points)
+def cases(sizes=polygonSizes):
+    shapes = [('rectangle', 'squareRectangle', rectangle), ('triangle', 'squareTriangle', triangle)]
+    for n in sizes:
+        shapes.append(('polygon'+str(n), 'squarePolygon', regularPolygon(n)))
+    shapes.append(('concave20', 'squarePolygon', concavePolygon(20)))
+    return shapes
+
+#Numbers of vertices of the concave polygons that splitting into triangles is timed on
+triangulationSizes = [100, 300, 1000, 3000, 10000]
+
+#The fastest of repeats calls of func, in seconds, and what the last call returned
+#Each call starts from an empty plan cache, unless cold is False
+def fastest(func, repeats, cold=True):
+    import SquarePolygons as poly
+    best = None
+    for i in range(repeats):
+        if (cold):
+            poly.planCache.clear()
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter()-start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+#Peak memory in bytes allocated by Python while func runs, traced by tracemalloc
+#Tracing slows everything down, so it's measured in a run of its own rather than while timing
+def peakMemory(func):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+#Time building the construction in a scene of its own
+#Returns the times with an empty and a full plan cache, the peak memory used building it with
+#an empty plan cache, and the scene and animations that were built
+def planResults(type, points, repeats):
+    import RulerCompassAnimations as rc
+    import SquarePolygons as poly
+    import Batch
+    scene = rc.Scene()
+    #keep only the last build's steps, so the timeline doesn't grow with each repeat
+    def build():
+        scene.clear()
+        return scene.build(Batch.buildConstruction, type, points)
+    cold, animations = fastest(build, repeats)
+    warm, animations = fastest(build, repeats, cold=False)
+    
+    poly.planCache.clear()
+    scene.clear()
+    built = []
+    peak = peakMemory(lambda: built.append(build()))
+    return {'build': cold, 'buildCached': warm, 'buildPeakMemory': peak}, scene, built[0]
+
+#Time the artists being set for every frame in order, the way playback calls animate, without
+#drawing them
+def frameResults(animations):
+    import RulerCompassAnimations as rc
+    start = time.perf_counter()
+    schedule = rc.Schedule(animations)
+    scheduleTime = time.perf_counter()-start
+    frames = animations[-1].i_max+1
+    start = time.perf_counter()
+    for frame in range(frames):
+        rc.animate(frame, animations, schedule)
+    seconds = time.perf_counter()-start
+    return {'schedule': scheduleTime, 'animatePerFrame': seconds/frames}, schedule
+
+#Draw frames spread over the construction on the Agg canvas
+#Returns the frames drawn per second, including setting the artists for each frame, and the
+#peak memory used drawing them again
+def renderResults(scene, schedule, frames, count):
+    count = min(count, frames)
+    chosen = [round(i*(frames-1)/max(count-1, 1)) for i in range(count)]
+    def render():
+        for frame in chosen:
+            schedule.seek(frame)
+            scene.fig.canvas.draw()
+    scene.fig.canvas.draw()
+    start = time.perf_counter()
+    render()
+    seconds = time.perf_counter()-start
+    return {'renderFps': count/seconds, 'renderPeakMemory': peakMemory(render)}
+
+#Time saving the construction as an MP4 and a GIF in one process, then save them both again to
+#find the peak memory used by this process. ffmpeg's memory isn't included
+def exportResults(scene, animations, dpi, fps):
+    import Export
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        def saveMP4():
+            Export.saveMP4(scene.fig, animations, os.path.join(folder, 'benchmark.mp4'), processes=1, fps=fps, dpi=dpi)
+        def saveGIF():
+            Export.saveGIF(scene.fig, animations, os.path.join(folder, 'benchmark.gif'), fps=fps, dpi=dpi)
+        start = time.perf_counter()
+        saveMP4()
+        results['mp4'] = time.perf_counter()-start
+        start = time.perf_counter()
+        saveGIF()
+        results['gif'] = time.perf_counter()-start
+        results['exportPeakMemory'] = max(peakMemory(saveMP4), peakMemory(saveGIF))
+    return results
+
+#Run the suite on one case, returning its results
+def runCase(name, type, points, settings=settings):
+    import Batch
+    result = {'name': name, 'type': type, 'sides': len(points)}
+    plan, scene, animations = planResults(type, points, settings['repeats'])
+    frames = animations[-1].i_max+1
+    result.update({'steps': len(animations), 'frames': frames})
+    result.update(plan)
+    
+    Batch.warmUp(scene, settings['dpi'])
+    timings, schedule = frameResults(animations)
+    result.update(timings)
+    result.update(renderResults(scene, schedule, frames, settings['renderFrames']))
+    if (len(points)<=settings['exportSides']):
+        result.update(exportResults(scene, animations, settings['dpi'], settings['fps']))
+    scene.clear()
+    return result
+
+#Time checking and splitting into triangles a concave polygon with each number of vertices in
+#sizes, checking that the triangles cover the polygon exactly
+#growth is how the time grows with the number of vertices since the size before: 1 if it's in
+#proportion to it, 2 if it's in proportion to its square
+def triangulationResults(sizes=triangulationSizes, repeats=settings['repeats']):
+    import RulerCompassAnimations as rc
+    import Triangulation
+    results = []
+    for n in sizes:
+        points = [rc.Point(x, y) for x, y in concavePolygon(n)]
+        validate = fastest(lambda: Triangulation.validatePolygon(points), repeats, cold=False)[0]
+        split, triangles = fastest(lambda: Triangulation.triangulate(points, validate=False), repeats, cold=False)
+        area = math.fsum(Triangulation.cross(points[a].x, points[a].y, points[b].x, points[b].y, points[c].x, points[c].y)
+                         for a, b, c in triangles)
+        result = {'name': 'triangulation'+str(n), 'vertices': n, 'triangles': len(triangles),
+                  'valid': abs(area-Triangulation.signedArea(points))<=1e-9*abs(area), 'validate': validate,
+                  'triangulate': split, 'growth': None}
+        if (len(results)>0):
+            result['growth'] = math.log((validate+split)/(results[-1]['validate']+results[-1]['triangulate']))/math.log(n/results[-1]['vertices'])
+        results.append(result)
+    return results
+
+#The commit being benchmarked, if this is a git checkout
+def gitCommit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=folder, check=True, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, universal_newlines=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+#Run the whole suite, printing each result as it's made
+#triangulation is the numbers of vertices to time splitting polygons into triangles with,
+#defaulting to triangulationSizes
+#Returns the results, ready to be saved as JSON
+def runSuite(sizes=polygonSizes, settings=settings, triangulation=None):
+    import numpy
+    import matplotlib
+    seconds, matplotlibImported = importTime()
+    results = {'commit': gitCommit(), 'python': platform.python_version(), 'numpy': numpy.__version__,
+               'matplotlib': matplotlib.__version__, 'platform': platform.platform(), 'settings': settings,
+               'import': seconds, 'importedMatplotlib': matplotlibImported, 'cases': []}
+    print('import', round(seconds, 3), 's')
+    for name, type, points in cases(sizes):
+        results['cases'].append(runCase(name, type, points, settings))
+        print(name, {key: round(value, 6) if isinstance(value, float) else value
+                     for key, value in results['cases'][-1].items() if key not in ('name', 'type')})
+    results['triangulation'] = triangulationResults(triangulationSizes if triangulation is None else triangulation,
+                                                    settings['repeats'])
+    for result in results['triangulation']:
+        print(result['name'], {key: round(value, 6) if isinstance(value, float) else value
+                               for key, value in result.items() if key!='name'})
+    try:
+        import resource
+        #kilobytes on Linux, bytes on macOS
+        results['maxRss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        results['maxRss'] = None
+    return results
+
+#Results where a bigger number is better. For everything else smaller is better
+higherIsBetter = ['renderFps']
+
+#Results that describe a case rather than measure it, which aren't compared
+descriptive = ['sides', 'steps', 'frames', 'vertices', 'triangles']
+
+#Compare the results of two runs, printing the times, rates and memory use that changed by more
+#than tolerance (0.25 is 25%) for the worse or the better
+#Returns the names of the results that got worse
+def compareResults(old, new, tolerance=0.25):
+    def measured(key, value):
+        return isinstance(value, (int, float)) and not isinstance(value, bool) and key not in descriptive
+    def values(results):
+        found = {('import', 'import'): results['import']}
+        if (measured('maxRss', results.get('maxRss'))):
+            found[('process', 'maxRss')] = results['maxRss']
+        for case in results['cases']+results.get('triangulation', []):
+            for key, value in case.items():
+                if (measured(key, value)):
+                    found[(case['name'], key)] = value
+        return found
+    oldValues = values(old)
+    newValues = values(new)
+    regressions = []
+    for key in newValues:
+        if (key not in oldValues or oldValues[key]<=0 or newValues[key]<=0):
+            continue
+        ratio = newValues[key]/oldValues[key]
+        if (key[1] in higherIsBetter):
+            ratio = 1/ratio
+        if (ratio>1+tolerance):
+            regressions.append(key[0]+' '+key[1])
+            print('worse', key[0], key[1], oldValues[key], '->', newValues[key])
+        elif (ratio<1/(1+tolerance)):
+            print('better', key[0], key[1], oldValues[key], '->', newValues[key])
+    return regressions
+
+if (__name__=='__main__'):
+    parser = argparse.ArgumentParser(description='Benchmark building, animating and exporting constructions')
+    parser.add_argument('--output', default='benchmark.json', help='file to save the results in as JSON')
+    parser.add_argument('--compare', default=None, help='results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='change counted as a regression, 0.25 is 25%%')
+    parser.add_argument('--sizes', type=int, nargs='*', default=polygonSizes, help='numbers of sides of the polygons')
+    parser.add_argument('--triangulation-sizes', type=int, nargs='*', default=triangulationSizes,
+                        help='numbers of vertices of the polygons to time splitting into triangles')
+    parser.add_argument('--import-only', action='store_true', help='only check the import time against the target')
+    args = parser.parse_args()
+    
+    if (args.import_only):
+        sys.exit(0 if checkImport() else 1)
+    results = runSuite(args.sizes, triangulation=args.triangulation_sizes)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print('Results saved in', args.output)
+    if (args.compare is not None):
+        with open(args.compare) as f:
+            regressions = compareResults(json.load(f), results, args.tolerance)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,369 @@
+"""
+Export
+Library to render RulerCompassAnimations constructions to video and image files
+without showing them, splitting the frames between several processes.
+
+Copyright (C) 2019 Sam Hartburn
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+author: Sam Hartburn
+email: sam@samhartburn.co.uk
+website: www.samhartburn.co.uk
+"""
+
+import math
+import os
+import itertools
+import subprocess
+import tempfile
+import multiprocessing
+import numpy as np
+import matplotlib
+from matplotlib import colors
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PIL import Image, GifImagePlugin
+import RulerCompassAnimations as rc
+
+#The figure and animations being exported. Worker processes are forked from the process
+#that sets this, so they get their own copy without anything having to be pickled
+exportState = None
+
+#Writes frames of a figure into a video by piping its Agg buffer straight into ffmpeg as raw
+#RGBA, instead of saving every frame with savefig. ffmpeg is started once and kept open.
+#pixelFormat is the pixel format of the video, crf its quality (0 is lossless, higher numbers
+#are smaller files) and preset how much time x264 spends on compression
+#Use it in a with block, calling writeFrame for each frame
+class RawVideoWriter:
+    def __init__(self, fig, filename, fps=5, dpi=None, pixelFormat='yuv420p', crf=23, preset='medium', codec='libx264'):
+        if (dpi is None):
+            dpi = matplotlib.rcParams['savefig.dpi']
+        self.fig = fig
+        self.oldCanvas = fig.canvas
+        self.oldDpi = fig.dpi
+        fig.set_dpi(dpi)
+        self.canvas = FigureCanvasAgg(fig)
+        renderer = self.canvas.get_renderer()
+        width = int(renderer.width)
+        height = int(renderer.height)
+
+        command = [matplotlib.rcParams['animation.ffmpeg_path'], '-y', '-loglevel', 'error',
+                   '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', str(width)+'x'+str(height), '-r', str(fps), '-i', '-']
+        #most pixel formats need an even width and height
+        if (width%2==1 or height%2==1):
+            command.extend(['-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2:color=white'])
+        command.extend(['-vcodec', codec, '-pix_fmt', pixelFormat, '-crf', str(crf), '-preset', preset, filename])
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    #Draw the figure and write it to the video count times
+    def writeFrame(self, count=1):
+        self.canvas.draw()
+        frame = memoryview(self.canvas.buffer_rgba())
+        for i in range(count):
+            self.process.stdin.write(frame)
+
+    def close(self):
+        self.process.stdin.close()
+        returnCode = self.process.wait()
+        self.fig.set_dpi(self.oldDpi)
+        self.fig.set_canvas(self.oldCanvas)
+        if (returnCode!=0):
+            raise subprocess.CalledProcessError(returnCode, self.process.args)
+
+#Colours in the style file that can end up in a frame
+styleFileColours = ['figure.facecolor', 'axes.facecolor', 'axes.edgecolor', 'axes.labelcolor', 'text.color',
+                    'xtick.color', 'ytick.color', 'lines.color', 'patch.facecolor', 'patch.edgecolor']
+
+#The colours frames of animations are drawn with, as RGB rows from 0 to 1: the backgrounds and
+#other colours from the style file and every colour in the steps' styles. Translucent colours
+#are given as they look over each opaque colour, as that's how they appear in a frame
+def frameColours(fig, animations):
+    rgba = [fig.get_facecolor()]
+    rgba.extend(matplotlib.rcParams[key] for key in styleFileColours)
+    rgba.extend(matplotlib.rcParams['axes.prop_cycle'].by_key().get('color', []))
+    for a in animations:
+        style = a.style
+        rgba.extend([style.stdColour, style.stdFaceColour, style.stdEdgeColour,
+                     style.emphColour, style.emphFaceColour, style.emphEdgeColour])
+    rgba = [colors.to_rgba(c) for c in rgba if colors.is_color_like(c)]
+
+    opaque = [c[:3] for c in rgba if c[3]==1]
+    if (len(opaque)==0):
+        opaque = [(1,1,1)]
+    blended = [tuple(c[3]*np.array(c[:3])+(1-c[3])*np.array(under)) for c in rgba if 0<c[3]<1 for under in opaque]
+    return np.unique(np.round(np.array(opaque+blended), 6), axis=0)
+
+#A 256 colour palette for GIFs of animations, as a flat list of RGB values from 0 to 255
+#As well as the colours from frameColours it has blends between each pair of them, for the
+#antialiased edges where one colour is drawn over another. If there are too many colours for
+#that, each one is only blended with the figure's background. The one palette is used for
+#every frame
+def gifPalette(fig, animations):
+    base = frameColours(fig, animations)[:256]
+    pairs = list(itertools.combinations(range(len(base)), 2))
+    steps = 0
+    if (len(pairs)>0):
+        steps = min(8, (256-len(base))//len(pairs))
+    if (steps==0):
+        #too many colours to blend every pair, so just blend each one with the background
+        background = colors.to_rgb(fig.get_facecolor())
+        pairs = [(i, -1) for i in range(len(base))]
+        base = np.vstack([base, background])
+        steps = max(0, min(8, (256-len(base))//len(pairs)))
+    palette = [base]
+    for fraction in np.arange(1, steps+1)/(steps+1):
+        palette.append(np.array([fraction*base[i]+(1-fraction)*base[j] for i, j in pairs]).reshape(-1, 3))
+    palette = np.vstack(palette)
+    palette = np.round(palette*255).astype(np.uint8)
+    _, first = np.unique(palette, axis=0, return_index=True)
+    palette = palette[np.sort(first)][:256]
+    palette = np.vstack([palette, np.zeros((256-len(palette), 3), dtype=np.uint8)])
+    return palette.flatten().tolist()
+
+#Writes frames of a figure into a GIF without any other program. Every frame is mapped onto the
+#same 256 colour palette, only the rectangle that changed since the previous frame is stored,
+#and identical frames in a row are stored once and shown for longer
+#palette is a flat list of RGB values, such as from gifPalette. loop is the number of times to
+#repeat the GIF, with 0 meaning forever
+#Use it in a with block, calling writeFrame for each frame. It draws the figure as it is, so
+#the artists must already be made and not animated, as prepareArtists leaves them
+class GIFWriter:
+    def __init__(self, fig, filename, palette, fps=5, dpi=None, loop=0):
+        if (dpi is None):
+            dpi = matplotlib.rcParams['savefig.dpi']
+        self.fig = fig
+        self.oldCanvas = fig.canvas
+        self.oldDpi = fig.dpi
+        fig.set_dpi(dpi)
+        self.canvas = FigureCanvasAgg(fig)
+        renderer = self.canvas.get_renderer()
+        self.width = int(renderer.width)
+        self.height = int(renderer.height)
+        self.fps = fps
+        self.palette = Image.new('P', (1, 1))
+        self.palette.putpalette(palette)
+        #frames written so far, the last frame drawn, and the part of it waiting to be written
+        #until it's known how long it's shown for, as (image, offset, first frame)
+        self.frames = 0
+        self.previous = None
+        self.pending = None
+
+        self.file = open(filename, 'wb')
+        self.file.write(b'GIF89a')
+        #logical screen with a 256 colour global palette
+        self.file.write(self.width.to_bytes(2, 'little') + self.height.to_bytes(2, 'little') + bytes([0xf7, 0, 0]))
+        self.file.write(bytes(palette))
+        #application extension to repeat the GIF
+        self.file.write(b'\x21\xff\x0bNETSCAPE2.0\x03\x01' + loop.to_bytes(2, 'little') + b'\x00')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    #Hundredths of a second from the start of the GIF to the start of frame
+    def time(self, frame):
+        return round(frame*100/self.fps)
+
+    #Write the pending part of a frame, shown until the current frame
+    def flush(self):
+        if (self.pending is None):
+            return
+        image, offset, first = self.pending
+        #GIF delays are 16 bit
+        delay = min(self.time(self.frames)-self.time(first), 0xffff)
+        self.file.write(b''.join(GifImagePlugin.getdata(image, offset, duration=delay*10, disposal=1)))
+        self.pending = None
+
+    #Draw the figure and write it to the GIF count times
+    def writeFrame(self, count=1):
+        self.canvas.draw()
+        rgb = np.asarray(self.canvas.buffer_rgba())[:, :, :3]
+        if (self.previous is None):
+            box = (0, 0, self.width, self.height)
+        else:
+            changed = np.any(rgb!=self.previous, axis=2)
+            rows = np.flatnonzero(changed.any(axis=1))
+            columns = np.flatnonzero(changed.any(axis=0))
+            box = None
+            if (len(rows)>0):
+                box = (columns[0], rows[0], columns[-1]+1, rows[-1]+1)
+
+        if (box is not None):
+            self.flush()
+            image = Image.fromarray(np.ascontiguousarray(rgb[box[1]:box[3], box[0]:box[2]]), 'RGB')
+            image = image.quantize(palette=self.palette, dither=Image.Dither.NONE)
+            self.pending = (image, (int(box[0]), int(box[1])), self.frames)
+            self.previous = rgb.copy()
+        self.frames += count
+
+    def close(self):
+        try:
+            self.flush()
+            self.file.write(b';')
+        finally:
+            self.file.close()
+            self.fig.set_dpi(self.oldDpi)
+            self.fig.set_canvas(self.oldCanvas)
+
+#Render frames first to last-1 of the animations in exportState into their own MP4 file
+#Runs in a worker process, on an Agg canvas so no window is ever opened
+#Frames that look the same as the one before, found by Schedule.runs, aren't drawn again; the
+#frame is written to the video once for each of them
+#settings are passed on to RawVideoWriter
+#profiler is a Profiling.FrameProfiler to record the frames drawn in, or None
+def renderChunk(first, last, filename, fps, dpi, settings, profiler=None):
+    fig, animations = exportState
+    schedule = rc.Schedule(animations)
+    with RawVideoWriter(fig, filename, fps, dpi, **settings) as writer:
+        for frame, count in schedule.runs(first, last):
+            rc.animate(frame, animations, schedule, profiler)
+            writer.writeFrame(count)
+            if (profiler is not None):
+                profiler.drawn('mp4')
+    return filename
+
+#Join MP4 files with the same encoding into one, in order, without re-encoding them
+def joinMP4(filenames, filename):
+    listFile = os.path.join(os.path.dirname(filenames[0]), 'chunks.txt')
+    with open(listFile, 'w') as f:
+        for name in filenames:
+            f.write("file '"+name+"'\n")
+    subprocess.run([matplotlib.rcParams['animation.ffmpeg_path'], '-y', '-loglevel', 'error',
+                    '-f', 'concat', '-safe', '0', '-i', listFile, '-c', 'copy', filename], check=True)
+
+#Save frames of the animations in exportState as PNG files called filename_<frame>.png
+#Runs in a worker process, on an Agg canvas so no window is ever opened
+def renderFrames(frames, filename, dpi):
+    fig, animations = exportState
+    canvas = fig.canvas
+    FigureCanvasAgg(fig)
+    schedule = rc.Schedule(animations)
+    filenames = []
+    for frame in frames:
+        schedule.seek(frame)
+        filenames.append(filename+'_'+str(frame)+'.png')
+        fig.savefig(filenames[-1], dpi=dpi)
+    fig.set_canvas(canvas)
+    return filenames
+
+#Run func for each set of arguments in jobs with exportState set to fig and animations,
+#in processes worker processes. Returns the results in the same order as jobs
+def runJobs(fig, animations, func, jobs, processes):
+    global exportState
+
+    #the workers need their own copy of the figure, which they only get by being forked
+    if ('fork' not in multiprocessing.get_all_start_methods()):
+        processes = 1
+    exportState = (fig, animations)
+    try:
+        if (processes>1):
+            with multiprocessing.get_context('fork').Pool(processes) as pool:
+                return pool.starmap(func, jobs)
+        return [func(*job) for job in jobs]
+    finally:
+        exportState = None
+
+#Make the artists for animations that haven't been made yet, and make sure canvas.draw draws all
+#of them: artists left animated by a FuncAnimation are skipped by it. That includes the artists
+#on the axes of the animations' scenes that aren't any one step's, such as the LineCollections
+#of a scene made with collections=True and the idle artists of a pooled one
+def prepareArtists(animations):
+    rc.createArtists(animations)
+    scenes = {id(a.scene): a.scene for a in animations if a.scene is not None}
+    for scene in scenes.values():
+        for artist in scene.ax.get_children():
+            artist.set_animated(False)
+    for a in animations:
+        if (a.obj is not None):
+            a.obj.set_animated(False)
+
+#The frame each step of animations finishes on, in order
+def stepEndFrames(animations):
+    return sorted({a.i_max for a in animations})
+
+#Save just the given frames of animations as PNG files called filename_<frame>.png, for example
+#stepEndFrames(animations) for a picture of each step, or [animations[-1].i_max] with a low
+#dpi for a thumbnail. Frames can be in any order and are shared between processes
+#Returns the names of the files saved
+def saveFrames(fig, animations, frames, filename, processes=1, dpi=None):
+    if (dpi is None):
+        dpi = matplotlib.rcParams['savefig.dpi']
+    processes = max(1, min(processes, len(frames)))
+    #make the artists before any workers are forked, so they all share them
+    prepareArtists(animations)
+    jobs = [(frames[i::processes], filename, dpi) for i in range(processes)]
+    filenames = runJobs(fig, animations, renderFrames, jobs, processes)
+    return [name for names in filenames for name in names]
+
+#Save animations as an MP4, rendering chunks of frames in separate processes
+#processes is the number of worker processes to use, defaulting to one per core
+#chunks is the number of pieces to split the frames into, defaulting to one per process
+#pixelFormat, crf and preset are passed on to RawVideoWriter
+#profiler is a Profiling.FrameProfiler to record the frames in, or None. The frames are then
+#all rendered in this process, as worker processes can't add to it
+def saveMP4(fig, animations, filename, processes=None, chunks=None, fps=5, dpi=None,
+            pixelFormat='yuv420p', crf=23, preset='medium', profiler=None):
+    if (processes is None):
+        processes = os.cpu_count()
+    if (chunks is None):
+        chunks = processes
+    if (profiler is not None):
+        chunks = 1
+    if (dpi is None):
+        dpi = matplotlib.rcParams['savefig.dpi']
+    settings = {'pixelFormat': pixelFormat, 'crf': crf, 'preset': preset}
+
+    #make the artists before any workers are forked, so they all share them
+    prepareArtists(animations)
+
+    frames = animations[-1].i_max+1
+    chunks = max(1, min(chunks, frames))
+    chunkLength = math.ceil(frames/chunks)
+    if (chunks==1):
+        runJobs(fig, animations, renderChunk, [(0, frames, filename, fps, dpi, settings, profiler)], 1)
+        return
+
+    with tempfile.TemporaryDirectory() as folder:
+        jobs = []
+        for i in range(chunks):
+            first = i*chunkLength
+            last = min(frames, first+chunkLength)
+            if (first<last):
+                jobs.append((first, last, os.path.join(folder, 'chunk'+str(i)+'.mp4'), fps, dpi, settings))
+
+        filenames = runJobs(fig, animations, renderChunk, jobs, processes)
+        joinMP4(filenames, filename)
+
+#Save animations as a GIF, drawn in this process and encoded by GIFWriter with a palette made
+#from the colours in the steps' styles and the style file
+#Frames that look the same as the one before, found by Schedule.runs, aren't drawn again; the
+#frame is shown for longer instead
+#profiler is a Profiling.FrameProfiler to record the frames drawn in, or None
+def saveGIF(fig, animations, filename, fps=5, dpi=None, loop=0, profiler=None):
+    prepareArtists(animations)
+    schedule = rc.Schedule(animations)
+    with GIFWriter(fig, filename, gifPalette(fig, animations), fps, dpi, loop) as writer:
+        for frame, count in schedule.runs():
+            rc.animate(frame, animations, schedule, profiler)
+            writer.writeFrame(count)
+            if (profiler is not None):
+                profiler.drawn('gif')
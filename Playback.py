@@ -0,0 +1,93 @@
+"""
+Playback
+Plays RulerCompassAnimations constructions in a matplotlib window, redrawing
+only the parts of each frame that change.
+
+Copyright (C) 2019 Sam Hartburn
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+author: Sam Hartburn
+email: sam@samhartburn.co.uk
+website: www.samhartburn.co.uk
+"""
+
+from matplotlib import animation
+from matplotlib import patches as pat
+
+#FuncAnimation that only blits the artists animate says have changed. Blitting restores a saved
+#background before drawing the changed artists, so the background has to contain everything
+#that isn't changing. Whenever the set of changing artists is different to the last frame, the
+#axes are redrawn without them and the background is saved again.
+#redrawn holds the number of artists drawn on each frame, to check that blitting is working
+#profiler is the Profiling.FrameProfiler func records frames in, if any, which is told when each
+#frame has been drawn. Without blitting the figure is only drawn when the GUI gets round to it,
+#so the draw time recorded doesn't include it
+class ConstructionAnimation(animation.FuncAnimation):
+    def __init__(self, fig, func, schedule, profiler=None, **kwargs):
+        self.schedule = schedule
+        self.profiler = profiler
+        self.animatedArtists = []
+        self.redrawn = []
+        super().__init__(fig, func, **kwargs)
+        
+    def _draw_next_frame(self, framedata, blit):
+        super()._draw_next_frame(framedata, blit)
+        if (self.profiler is not None):
+            blitting = blit and not self._fig.canvas.is_saving() and len(self.redrawn)>0
+            self.profiler.drawn('playback', self.redrawn[-1] if blitting else None)
+        
+    def _draw_frame(self, framedata):
+        super()._draw_frame(framedata)
+        if (not self._blit or self._fig.canvas.is_saving()):
+            return
+        
+        self._drawn_artists = self.withArtistsAbove(self._drawn_artists)
+        for artist in self._drawn_artists:
+            artist.set_animated(True)
+        
+        #nothing changed, so just blit the artists from the last frame again. They're still drawn
+        #on top of the background, so they count as redrawn
+        if (len(self._drawn_artists)==0):
+            self._drawn_artists = self.animatedArtists
+            self.redrawn.append(len(self._drawn_artists))
+            return
+        
+        if (set(self._drawn_artists) == set(self.animatedArtists)):
+            self.redrawn.append(len(self._drawn_artists))
+            return
+        
+        #artists that have stopped changing go into the background
+        for artist in self.animatedArtists:
+            if (artist not in self._drawn_artists):
+                artist.set_animated(False)
+        self.animatedArtists = self._drawn_artists
+        renderer = self._fig.canvas.get_renderer()
+        for axes in {artist.axes for artist in self._drawn_artists}:
+            axes.draw(renderer)
+        self._blit_cache.clear()
+        self.redrawn.append(sum(1 for artist in self.schedule.artists if artist.get_visible()))
+        
+    #Blitted artists are drawn on top of the background, so a filled polygon that has changed
+    #would cover the lines that should be drawn over it. Add every visible artist that comes
+    #after it in the axes' drawing order, and keep the artists in that order
+    def withArtistsAbove(self, artists):
+        filled = [artist for artist in artists if isinstance(artist, pat.Polygon)]
+        if (len(filled)==0):
+            return artists
+        order = sorted(self.schedule.artists, key=lambda artist: artist.get_zorder())
+        position = {artist: i for i, artist in enumerate(order)}
+        first = min(position[artist] for artist in filled)
+        changed = set(artists)
+        return [artist for i, artist in enumerate(order) if artist in changed or (i>first and artist.get_visible())]
@@ -0,0 +1,156 @@
+"""
+Profiling
+Records how long each frame of a construction takes to update and draw, and
+which steps were involved, to find out why a render is slow.
+
+Copyright (C) 2019 Sam Hartburn
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+author: Sam Hartburn
+email: sam@samhartburn.co.uk
+website: www.samhartburn.co.uk
+"""
+
+"""
+Pass a FrameProfiler to performAnimation, animate, Export.saveMP4 or
+Export.saveGIF, then print its report:
+    profiler = FrameProfiler()
+    rc.performAnimation(animations, saveAsGIF=True, filename='square', profiler=profiler)
+    print(profiler.report())
+callback is called with the record of each frame as soon as it's drawn, to
+send the timings somewhere else as they're made.
+"""
+
+import time
+import numpy as np
+import RulerCompassAnimations as rc
+
+#The percentiles given in a summary
+percentiles = [50, 90, 99]
+
+#The most steps named for each frame in a report
+stepsListed = 10
+
+#Record of each frame drawn. animate calls updated once it has set the artists for a frame,
+#and whatever draws the frame calls drawn once it has been drawn; the time in between is the
+#draw time. A frame that's updated but never drawn, such as one skipped by a FuncAnimation, has
+#no draw time, so it isn't recorded; undrawn counts them. Each record is a dictionary with:
+#frame, output: the frame, and what drew it ('playback', 'mp4' or 'gif')
+#update, draw: seconds spent setting the artists and drawing them
+#active: the number of steps of each type active on the frame
+#changed: indices in animations of the steps whose artists changed
+#redrawn: the number of artists drawn
+#artists: the number of artists on the axes
+class FrameProfiler:
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.records = []
+        self.undrawn = 0
+        self.schedule = None
+        self.current = None
+        self.updateEnd = None
+
+    #Start the record of frame, once animate has set the artists in schedule for it
+    def updated(self, frame, schedule, seconds):
+        #the frame before was never drawn
+        if (self.current is not None):
+            self.undrawn += 1
+        if (schedule is not self.schedule):
+            self.schedule = schedule
+            #the LineCollections and pooled artists of the schedule may not have been made yet
+            axes = [artist.axes for artist in schedule.artists]+[batches.ax for batches in schedule.lineBatches]
+            axes.extend(pool.ax for pool in schedule.pools)
+            self.axes = list({id(ax): ax for ax in axes if ax is not None}.values())
+        active = {type.name: 0 for type in rc.StepType}
+        if (frame>=0 and frame<len(schedule.active)):
+            for index in schedule.active[frame]:
+                active[schedule.animations[index].type.name] += 1
+        self.current = {'frame': frame, 'output': None, 'update': seconds, 'draw': None, 'active': active,
+                        'changed': list(schedule.changedSteps)}
+        #the draw is timed from here, leaving out the time spent making the record
+        self.updateEnd = time.perf_counter()
+
+    #Finish the record of the current frame, once it has been drawn by output
+    #redrawn is the number of artists drawn, defaulting to every visible one
+    def drawn(self, output, redrawn=None):
+        if (self.current is None):
+            return
+        seconds = time.perf_counter()-self.updateEnd
+        self.current['output'] = output
+        if (redrawn is None):
+            redrawn = sum(1 for artist in self.schedule.artists if artist.get_visible())
+        self.finish(seconds, redrawn, sum(len(axes.get_children()) for axes in self.axes))
+
+    def finish(self, seconds, redrawn, artists):
+        record = self.current
+        record.update({'draw': seconds, 'redrawn': redrawn, 'artists': artists})
+        self.records.append(record)
+        self.current = None
+        if (self.callback is not None):
+            self.callback(record)
+
+    #Percentiles, mean and maximum of the update, draw and total time and the artists redrawn
+    #over every frame recorded
+    def summary(self):
+        summary = {'frames': len(self.records), 'undrawn': self.undrawn}
+        if (len(self.records)==0):
+            return summary
+        columns = {'update': [record['update'] for record in self.records],
+                   'draw': [record['draw'] for record in self.records],
+                   'redrawn': [record['redrawn'] for record in self.records]}
+        columns['total'] = np.add(columns['update'], columns['draw'])
+        for name, values in columns.items():
+            values = np.asarray(values, dtype=float)
+            summary[name] = {'p'+str(p): float(v) for p, v in zip(percentiles, np.percentile(values, percentiles))}
+            summary[name]['mean'] = float(values.mean())
+            summary[name]['max'] = float(values.max())
+        summary['seconds'] = float(columns['total'].sum())
+        summary['artists'] = max(record['artists'] for record in self.records)
+        return summary
+
+    #The count slowest frames, slowest first
+    def slowFrames(self, count=10):
+        return sorted(self.records, key=lambda record: record['update']+record['draw'], reverse=True)[:count]
+
+    #Description of step index of animations, such as 'arc 12 (frames 30-45)'
+    def describeStep(self, index):
+        a = self.schedule.animations[index]
+        return a.type.name+' '+str(index)+' (frames '+str(a.i_min)+'-'+str(a.i_max)+')'
+
+    #Text report of the summary and the count slowest frames, naming the steps that changed on
+    #each of them
+    def report(self, count=10):
+        summary = self.summary()
+        lines = [str(summary['frames'])+' frames']
+        if (summary['undrawn']>0):
+            lines[0] += ' ('+str(summary['undrawn'])+' more updated but never drawn)'
+        if (summary['frames']==0):
+            return lines[0]
+        lines[0] += ' in '+format(summary['seconds'], '.3f')+' s, up to '+str(summary['artists'])+' artists on the axes'
+        for name in ('update', 'draw', 'total'):
+            lines.append(name+' ms: '+', '.join(key+' '+format(value*1000, '.2f') for key, value in summary[name].items()))
+        lines.append('redrawn: '+', '.join(key+' '+format(value, '.0f') for key, value in summary['redrawn'].items()))
+        lines.append('Slowest frames:')
+        for record in self.slowFrames(count):
+            active = ', '.join(str(n)+' '+name for name, n in record['active'].items() if n>0)
+            lines.append('frame '+str(record['frame'])+' ('+str(record['output'])+'): update '+
+                         format(record['update']*1000, '.2f')+' ms, draw '+format(record['draw']*1000, '.2f')+
+                         ' ms, '+str(record['redrawn'])+' redrawn, active: '+(active or 'none'))
+            steps = [self.describeStep(index) for index in record['changed'][:stepsListed]]
+            if (len(record['changed'])>stepsListed):
+                steps.append('and '+str(len(record['changed'])-stepsListed)+' more')
+            if (len(steps)>0):
+                lines.append('    changed: '+', '.join(steps))
+        return '\n'.join(lines)
@@ -36,64 +36,223 @@ Please feel free to use and modify this, but keep the above information. Thanks!
 
 import numpy as np
 import math
-from matplotlib import pyplot as plt
-from matplotlib import animation
-from matplotlib import patches as pat
+import os
+import json
+import enum
+import time
+import threading
 
-plt.style.use('RulerCompassAnimations.mplstyle')
+#Matplotlib isn't imported until something is rendered, so building constructions and using
+#the geometry functions doesn't need it. The style is applied then too
+styleFile = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'RulerCompassAnimations.mplstyle')
+styleApplied = False
 
 speed = 1
 
-fig = plt.figure()
-ax = plt.axes()
+#Apply the style in styleFile to matplotlib, the first time it's called
+def useStyle():
+    global styleApplied
+    if (not styleApplied):
+        from matplotlib import style
+        style.use(styleFile)
+        styleApplied = True
 
+#fig and ax are the default scene's figure and axes, and are only made when they're first used
+#ConstructionAnimation is in Playback, which needs matplotlib
+def __getattr__(name):
+    if (name=='fig'):
+        return defaultScene.fig
+    if (name=='ax'):
+        return defaultScene.ax
+    if (name=='ConstructionAnimation'):
+        import Playback
+        return Playback.ConstructionAnimation
+    raise AttributeError("module '"+__name__+"' has no attribute '"+name+"'")
+
+#The types of step. Animatable.type is one of these, which is quicker to compare on every frame
+#than a string; the name can be passed to Animatable instead, as in Animatable('line', ...)
+class StepType(enum.IntEnum):
+    line = 0
+    arc = 1
+    polygon = 2
+    lineTransform = 3
+
+#Looking up a member of StepType is slow compared to a plain name, so these are used instead
+lineStep = StepType.line
+arcStep = StepType.arc
+polygonStep = StepType.polygon
+lineTransformStep = StepType.lineTransform
+
+#frames is the number of frames the animation takes. If it isn't given, it's worked out from
+#the distance covered at speed
+#obj can be an artist made outside the library, such as a matplotlib Arc, Polygon or Line2D
+#already added to the axes. The centre and rotation of an arc, and the points, colour and
+#visibility of a polygon, are then taken from it. Such an artist is never put in an ArtistPool
+#There are thousands of steps in a large construction, so their attributes are kept in slots
+#rather than a dictionary for each one
 class Animatable:
-    def __init__(self, type, obj, start, end, i_min, radius=0, angle=0):
+    __slots__ = ('type', 'obj', 'scene', 'start', 'end', 'i_min', 'i_max', 'frames', 'distance',
+                 'radius', 'angle', 'transform', 'centre', 'rotation', 'points', 'initialColor',
+                 'frameToUnemphasise', 'frameToHide', 'hide', 'style', 'startVisible',
+                 'shown', 'emphasised', 'visible', 'ownArtist')
+    
+    def __init__(self, type, obj, start, end, i_min, radius=0, angle=0, frames=None):
+        if (isinstance(type, str)):
+            type = StepType[type]
         self.type = type
+        #obj can be None, in which case scene makes it when the animation is first rendered
         self.obj= obj
+        self.ownArtist = obj is not None
+        self.scene = None
         self.start = start
         self.end = end
         self.i_min = i_min
-        if (type=='line'):
-            self.distance = distanceBetweenPoints(start, end)
-        elif (type=='arc'):
-            theta = abs(end - start)
+        self.distance = None
+        if (type==arcStep):
             self.radius = radius
-            self.distance = 2*math.pi*radius*theta/360
-        elif (type=='polygon'):
-            self.distance=(end-start)*speed
-        elif (type=='lineTransform'):
-            self.distance = abs(2*math.pi*distanceBetweenPoints(start[0], start[1])*angle/360)
+        elif (type==lineTransformStep):
             self.transform = [end[0].x-start[0].x,end[0].y-start[0].y]
             self.angle = angle
-        self.frames=math.ceil(self.distance/speed)
+        if (frames is None):
+            if (type==lineStep):
+                self.distance = distanceBetweenPoints(start, end)
+            elif (type==arcStep):
+                theta = abs(end - start)
+                self.distance = 2*math.pi*radius*theta/360
+            elif (type==polygonStep):
+                self.distance=(end-start)*speed
+            elif (type==lineTransformStep):
+                self.distance = abs(2*math.pi*distanceBetweenPoints(start[0], start[1])*angle/360)
+            frames = math.ceil(self.distance/speed)
+        self.frames=frames
         self.i_max = i_min+self.frames
         self.frameToUnemphasise = -1
         self.frameToHide = -1
         self.hide = True
         self.style=Style()
+        #polygons can be shown before their animation starts
+        self.startVisible = True
+        if (obj is not None and type==arcStep):
+            #a UnitArc, or a matplotlib Arc
+            if (hasattr(obj, 'setAngles')):
+                self.centre = tuple(obj.centre)
+                self.rotation = obj.rotation
+            else:
+                self.centre = tuple(obj.center)
+                self.rotation = obj.angle
+        elif (obj is not None and type==polygonStep):
+            self.points = obj.get_xy().tolist()
+            self.initialColor = tuple(obj.get_facecolor())
+            self.startVisible = obj.get_visible()
+        #The value of i, emphasis and visibility currently applied to obj, so that they only
+        #have to be set on the frame they change. None means they haven't been applied yet
+        self.shown = None
+        self.emphasised = None
+        self.visible = None
         
     def setStyle(self, style):
         #print(style.stdColour)
         self.style=style
+        self.emphasised = None
+        
+    #How the animation should look at frame, worked out from the frame alone
+    #Returns the value of i to show (-1 before the animation starts, frames after it has
+    #finished), whether obj is visible and whether it is emphasised
+    def stateAt(self, frame):
+        if (frame<self.i_min):
+            i = -1
+        elif (frame>self.i_max):
+            i = self.frames
+        else:
+            i = frame-self.i_min
+        visible = not (self.hide and self.frameToHide>=0 and frame>=self.frameToHide)
+        if (self.type==polygonStep and frame<self.i_min):
+            visible = visible and self.startVisible
+        return (i, visible, frame<self.frameToUnemphasise)
+        
+    #Number of properties written to obj when its style is applied
+    def styleWrites(self):
+        if (self.type==polygonStep):
+            return 5
+        return 3
         
+    #Apply the emphasised or standard style to obj, if it isn't already applied
+    #Returns the number of properties written
+    def applyStyle(self, emphasised):
+        if (self.emphasised == emphasised):
+            return 0
+        self.emphasised = emphasised
+        if (emphasised):
+            self.obj.set_color(self.style.emphColour)
+            self.obj.set_linestyle(self.style.emphLineStyle)
+            self.obj.set_linewidth(self.style.emphLineWidth)
+            if (self.type==polygonStep):
+                self.obj.set_facecolor(self.style.emphFaceColour)
+                self.obj.set_edgecolor(self.style.emphEdgeColour)
+        else:
+            self.obj.set_color(self.style.stdColour)
+            self.obj.set_linestyle(self.style.stdLineStyle)
+            self.obj.set_linewidth(self.style.stdLineWidth)
+            if (self.type==polygonStep):
+                self.obj.set_facecolor(self.style.stdFaceColour)
+                self.obj.set_edgecolor(self.style.stdEdgeColour)
+        return self.styleWrites()
+    
+    #Show or hide obj, if it isn't already shown or hidden
+    #Returns the number of properties written
+    def setVisible(self, visible):
+        if (self.visible == visible):
+            return 0
+        self.visible = visible
+        self.obj.set_visible(visible)
+        return 1
+        
+#How a step looks normally and when it's emphasised
+#A Style can't be changed once it's made, so every step with the same style shares one: making
+#a Style with the same values as an existing one returns the existing one. Styles are kept in
+#interned, which only grows by one for each different style used
 class Style:
-    def __init__(self, stdColour='black', stdLineWidth=0.5, stdLineStyle='--',
-                 stdFaceColour='black', stdEdgeColour='black',
-                 emphColour='black', emphLineWidth=1, emphLineStyle='-',
-                 emphFaceColour='black', emphEdgeColour='black',):
-        self.stdColour=stdColour
-        self.stdLineWidth=stdLineWidth
-        self.stdLineStyle=stdLineStyle
-        self.stdFaceColour=stdFaceColour
-        self.stdEdgeColour=stdEdgeColour
-        self.emphColour=emphColour
-        self.emphLineWidth=emphLineWidth
-        self.emphLineStyle=emphLineStyle
-        self.emphFaceColour=emphFaceColour
-        self.emphEdgeColour=emphEdgeColour
+    __slots__ = ('stdColour', 'stdLineWidth', 'stdLineStyle', 'stdFaceColour', 'stdEdgeColour',
+                 'emphColour', 'emphLineWidth', 'emphLineStyle', 'emphFaceColour', 'emphEdgeColour')
+    interned = {}
+    
+    def __new__(cls, stdColour='black', stdLineWidth=0.5, stdLineStyle='--',
+                stdFaceColour='black', stdEdgeColour='black',
+                emphColour='black', emphLineWidth=1, emphLineStyle='-',
+                emphFaceColour='black', emphEdgeColour='black',):
+        values = (stdColour, stdLineWidth, stdLineStyle, stdFaceColour, stdEdgeColour,
+                  emphColour, emphLineWidth, emphLineStyle, emphFaceColour, emphEdgeColour)
+        #colours given as lists are stored as tuples, so that they can't be changed either
+        values = tuple(tuple(value) if isinstance(value, list) else value for value in values)
+        try:
+            style = cls.interned.get(values)
+            hashable = True
+        except TypeError:
+            #a colour that can't be hashed, such as a NumPy array, gets a style of its own
+            style = None
+            hashable = False
+        if (style is None):
+            style = object.__new__(cls)
+            for name, value in zip(cls.__slots__, values):
+                object.__setattr__(style, name, value)
+            #another thread may have made the same style first, in which case that one is used
+            if (hashable):
+                style = cls.interned.setdefault(values, style)
+        return style
+    
+    def __setattr__(self, name, value):
+        raise AttributeError('Style is immutable; make a new Style instead')
+    
+    def __reduce__(self):
+        return (Style, tuple(getattr(self, name) for name in Style.__slots__))
+    
+    #The values of the style, by name
+    def dict(self):
+        return {name: getattr(self, name) for name in Style.__slots__}
     
 class Point:
+    __slots__ = ('x', 'y')
+    
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -101,7 +260,260 @@ class Point:
     def list(self):
         return [self.x,self.y]
     
+#A figure and axes to build constructions in, with the timeline of every step added to it
+#The builder functions below add to the current scene, which is the default scene made with
+#pyplot unless another scene is being used in a with block in the same thread, so separate
+#threads can build and render their own scenes at the same time:
+#    scene = Scene()
+#    with scene:
+#        steps = perpendicularBisector(p1, p2, 1, 0)
+#Builder functions can also be called on a scene, as in scene.addStepLine(p1, p2, 0), and
+#scene.build(func, *args) calls any other builder, such as one from SquarePolygons, in it
+#The figure, axes and the artists for the steps aren't made until they are needed to render
+#the scene. A new scene gets its own figure on an Agg canvas, which pyplot doesn't know about,
+#unless pyplot is True; the default scene uses pyplot so that it can be shown in a window
+#With collections=True the lines and lineTransforms are drawn by Artists.LineBatches, which
+#puts all the lines in the same style into a few LineCollections, instead of by a Line2D each.
+#Frames with lots of lines on them then take a draw call for each style instead of each line
+#With pooled=True a step only has an artist while it can be seen. Schedule.seek hands the artists
+#of steps that have been hidden back to the scene's Artists.ArtistPool, and the steps shown next
+#take them from there, so the axes don't fill up with the hidden steps of a long construction
+class Scene:
+    def __init__(self, fig=None, ax=None, pyplot=False, collections=False, pooled=False):
+        self._fig = fig
+        self._ax = ax
+        self.pyplot = pyplot
+        self.collections = collections
+        self.pooled = pooled
+        self.lineBatches = None
+        self.artistPool = None
+        self.timeline = []
+        #Position of each step in the timeline
+        self.positions = {}
+        #The x and y limits fixLimits last set, or None
+        self.fixedXLim = None
+        self.fixedYLim = None
+        
+    @property
+    def fig(self):
+        self.setUp()
+        return self._fig
+    
+    @property
+    def ax(self):
+        self.setUp()
+        return self._ax
+    
+    #Make the figure and axes, if they haven't been made yet
+    def setUp(self):
+        if (self._fig is None):
+            useStyle()
+            if (self.pyplot):
+                from matplotlib import pyplot as plt
+                self._fig = plt.figure()
+            else:
+                from matplotlib.figure import Figure
+                from matplotlib.backends.backend_agg import FigureCanvasAgg
+                self._fig = Figure()
+                FigureCanvasAgg(self._fig)
+        if (self._ax is None):
+            self._ax = self._fig.add_subplot()
+    
+    #Make the artists for the steps that don't have them yet, in the order they were added so
+    #that they are drawn in that order
+    #Pooled steps get their artists from acquireArtist instead
+    def createArtists(self):
+        from matplotlib import patches as pat
+        import Artists
+        for step in self.timeline:
+            if (step.obj is not None):
+                continue
+            if (self.pooled and not (self.collections and step.type in (lineStep, lineTransformStep))):
+                if (self.artistPool is None):
+                    self.artistPool = Artists.ArtistPool(self.ax)
+            elif (step.type==arcStep):
+                #Pass in the start angle for both angles, so it is invisible at first
+                step.obj = Artists.UnitArc(step.centre, step.radius, step.rotation, step.start, step.start)
+                self.ax.add_patch(step.obj)
+            elif (step.type==polygonStep):
+                step.obj = pat.Polygon(step.points, facecolor=step.initialColor)
+                step.obj.set_visible(step.startVisible)
+                self.ax.add_patch(step.obj)
+            elif (self.collections):
+                if (self.lineBatches is None):
+                    self.lineBatches = Artists.LineBatches(self.ax)
+                step.obj = self.lineBatches.line()
+            else:
+                step.obj, = self.ax.plot([], [])
+        
+    #Set the view to bounds (xMin, yMin, xMax, yMax) plus the axes' margins, as autoscaling
+    #would if it could see everything the steps draw on every frame, and turn autoscaling off so
+    #that the view is the same on every frame. Limits this set before are worked out again, as
+    #steps may have been added since, but limits set any other way are left alone
+    def fixLimits(self, bounds):
+        if (bounds is None):
+            return
+        xMin, yMin, xMax, yMax = bounds
+        xMargin, yMargin = self.ax.margins()
+        if (self.ax.get_autoscalex_on() or self.ax.get_xlim()==self.fixedXLim):
+            width = xMax-xMin
+            self.ax.set_xlim(self.ax.xaxis.get_major_locator().nonsingular(xMin-xMargin*width, xMax+xMargin*width))
+            self.fixedXLim = self.ax.get_xlim()
+        if (self.ax.get_autoscaley_on() or self.ax.get_ylim()==self.fixedYLim):
+            height = yMax-yMin
+            self.ax.set_ylim(self.ax.yaxis.get_major_locator().nonsingular(yMin-yMargin*height, yMax+yMargin*height))
+            self.fixedYLim = self.ax.get_ylim()
+        self.ax.set_autoscale_on(False)
+        
+    #Give step of a pooled scene an artist from the pool, or a new one if there are none of its
+    #class free. Its geometry, style and visibility are left for Schedule.seek to set
+    def acquireArtist(self, step):
+        from matplotlib import patches as pat
+        from matplotlib.lines import Line2D
+        import Artists
+        kind = {arcStep: Artists.UnitArc, polygonStep: pat.Polygon}.get(step.type, Line2D)
+        obj = self.artistPool.take(kind)
+        if (obj is None):
+            if (step.type==arcStep):
+                obj = Artists.UnitArc(step.centre, step.radius, step.rotation, step.start, step.start)
+            elif (step.type==polygonStep):
+                obj = pat.Polygon(step.points)
+            else:
+                obj = Line2D([], [])
+            #add_patch and add_line would add the artist to the data limits, which aren't used once
+            #Schedule has fixed the view
+            self.ax.add_artist(obj)
+        elif (step.type==arcStep):
+            obj.setCircle(step.centre, step.radius, step.rotation)
+        elif (step.type==polygonStep):
+            obj.set_xy(step.points)
+        obj.set_animated(False)
+        #Artists with the same zorder are drawn in the order they were added to the axes, which
+        #isn't the timeline's order once they're reused. Keep that order by putting each step
+        #between the usual zorder of its class and half way to the next
+        position = self.positions[step]
+        obj.set_zorder(kind.zorder+0.5*position/(position+1))
+        step.obj = obj
+        step.shown = None
+        step.emphasised = None
+        step.visible = None
+        
+    #Hand the artist of step of a pooled scene back to the pool, hiding it
+    def releaseArtist(self, step):
+        self.artistPool.give(step.obj)
+        step.obj = None
+        step.shown = None
+        step.emphasised = None
+        step.visible = None
+        
+    def __enter__(self):
+        sceneStack().append(self)
+        return self
+    
+    def __exit__(self, *args):
+        sceneStack().pop()
+        
+    #Record step in the timeline and return it
+    def add(self, step):
+        step.scene = self
+        self.positions[step] = len(self.timeline)
+        self.timeline.append(step)
+        return step
+    
+    #Call builder with this as the current scene
+    def build(self, builder, *args, **kwargs):
+        with self:
+            return builder(*args, **kwargs)
+        
+    #Remove every step from the axes and the timeline, so the scene can be used again
+    def clear(self):
+        for step in self.timeline:
+            if (step.obj is not None):
+                step.obj.remove()
+        self.timeline = []
+        self.positions = {}
+        self.fixedXLim = None
+        self.fixedYLim = None
+        if (self.lineBatches is not None):
+            self.lineBatches.remove()
+            self.lineBatches = None
+        if (self.artistPool is not None):
+            self.artistPool.remove()
+            self.artistPool = None
+        if (self._ax is not None):
+            self._ax.relim()
+            self._ax.autoscale()
+
+#The scenes used in with blocks in this thread, innermost last
+sceneStacks = threading.local()
+
+def sceneStack():
+    if (not hasattr(sceneStacks, 'scenes')):
+        sceneStacks.scenes = []
+    return sceneStacks.scenes
+
+#The scene builder functions add to in this thread
+def currentScene():
+    scenes = sceneStack()
+    if (len(scenes)>0):
+        return scenes[-1]
+    return defaultScene
+
+defaultScene = Scene(pyplot=True)
+
+#Make the artists for every step in animations that doesn't have one yet
+def createArtists(animations):
+    scenes = []
+    for a in animations:
+        if (a.obj is None and a.scene not in scenes):
+            scenes.append(a.scene)
+    for scene in scenes:
+        scene.createArtists()
+    
+#Points stored as NumPy arrays of their x and y coordinates, so that the vectorised geometry
+#functions can work on lots of points at once. x and y can be any shape, as long as it's the
+#same for both
+class PointArray:
+    def __init__(self, x, y):
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        
+    #PointArray of a list of Points
+    @staticmethod
+    def fromPoints(points):
+        return PointArray([p.x for p in points], [p.y for p in points])
+    
+    #PointArray of an array with [x,y] in its last dimension
+    @staticmethod
+    def fromArray(array):
+        array = np.asarray(array, dtype=float)
+        return PointArray(array[...,0], array[...,1])
+    
+    def __len__(self):
+        return len(self.x)
+    
+    def __getitem__(self, index):
+        return PointArray(self.x[index], self.y[index])
+    
+    #Array with [x,y] in its last dimension
+    def array(self):
+        return np.stack([self.x, self.y], axis=-1)
+    
+    #The points as a list of Points
+    def points(self):
+        return [Point(x, y) for x, y in zip(self.x.ravel().tolist(), self.y.ravel().tolist())]
+    
+    #PointArray of the points after each one, going round to the first after the last
+    def roll(self, shift=-1):
+        return PointArray(np.roll(self.x, shift, axis=-1), np.roll(self.y, shift, axis=-1))
+
+#Convert a list of points to an array with one [x,y] row per point
+def pointArray(points):
+    return np.array([p.list() for p in points], dtype=float).reshape(-1,2)
+    
 class LineTransform:
+    __slots__ = ('pos1Start', 'pos1End', 'length', 'angleWithX', 'angleToRotate', 'pos2Start', 'pos2End')
+    
     def __init__(self, pos1Start, pos1End):
         self.pos1Start = pos1Start
         self.pos1End = pos1End
@@ -292,11 +704,11 @@ def addStepArc(centre, radius, rotation, theta1, theta2, i_start):
     
     #Create the arc and add it to the plot
     #Pass in theta1 for both angles, so it is invisible at first
-    arc = pat.Arc((centre.x,centre.y), radius*2, radius*2, rotation, theta1, theta1)
-    ax.add_patch(arc)
-    
-    #Create the object that defines how the arc should be animated
-    steps = [Animatable('arc', arc, theta1, theta2, i_start, radius)]
+    #The arc itself is made by the scene when it's first rendered
+    arc = Animatable('arc', None, theta1, theta2, i_start, radius)
+    arc.centre = (centre.x,centre.y)
+    arc.rotation = rotation
+    steps = [currentScene().add(arc)]
     #Draw a line at the same time, showing where the centre of the arc is and
     #rotating to match the point on the arc that is currently being drawn
     lt = LineTransform(centre, extendLineAngle(centre, radius, rotation+theta1))
@@ -316,11 +728,12 @@ def addStepPolygon(points, initialColor, visible, i_start, pause=10):
     for p in points:
         pts.append(p.list())
     
-    poly = plt.Polygon(pts,facecolor=initialColor)
-    poly.set_visible(visible)
-    ax.add_patch(poly)
-    step = Animatable('polygon', poly, 0, pause, i_start)
+    step = Animatable('polygon', None, 0, pause, i_start)
+    step.points = pts
+    step.initialColor = initialColor
     step.hide = False
+    step.startVisible = visible
+    currentScene().add(step)
             
     return step
 
@@ -349,18 +762,14 @@ def addStepDrawPolygon(points, initialColor, visible, i_start):
 #create an animation to add a line
 def addStepLine(point1, point2, i_start):
     
-    line, = ax.plot([], [])
-    #line = plt.Line2D([],[])
-    step = Animatable('line', line, point1, point2, i_start)
+    step = currentScene().add(Animatable('line', None, point1, point2, i_start))
     
     return step
 
 #create an animation to move and rotate a line
 def addStepLineTransform(lt, i_start):
     
-    line, = ax.plot([], [])
-    #line = plt.Line2D([],[])
-    step = Animatable('lineTransform', line, [lt.pos1Start, lt.pos1End], [lt.pos2Start, lt.pos2End], i_start, angle=lt.angleToRotate)
+    step = currentScene().add(Animatable('lineTransform', None, [lt.pos1Start, lt.pos1End], [lt.pos2Start, lt.pos2End], i_start, angle=lt.angleToRotate))
     
     return step
 
@@ -371,6 +780,229 @@ def setStepEndFrame(animations, frame):
         a.frameToUnemphasise=frame
     return animations
 
+#Change the frames of animations so that they take duration seconds at fps frames per second,
+#or at most maxFrames frames, or whichever is shorter if both are given
+#The frames on which steps start, finish, are hidden and are unemphasised split the timeline
+#into pieces, which are stretched or squashed in proportion to their length, and so to the
+#distance covered in them. While the budget allows, every piece is kept at least one frame long,
+#so that frames that were different stay different and in the same order, and pieces in the
+#middle of a step get at least minFrames frames each, so that every step still moves. The
+#pieces in the middle of steps are given their first frame before the others
+#Changes the animations themselves, and returns them
+def fitTimeline(animations, duration=None, maxFrames=None, fps=5, minFrames=1):
+    steps = list({id(a): a for a in animations}.values())
+    start = min(0, min(a.i_min for a in steps))
+    end = max(a.i_max for a in steps)
+    budget = end-start+1
+    if (duration is not None):
+        budget = max(1, round(duration*fps))
+    if (maxFrames is not None):
+        budget = min(budget, maxFrames)
+    
+    events = [a.frameToHide for a in steps]+[a.frameToUnemphasise for a in steps]
+    events = [frame for frame in events if frame>=max(start, 0) and frame<=end]
+    boundaries = np.unique([start, end]+[a.i_min for a in steps]+[a.i_max for a in steps]+events)
+    lengths = np.diff(boundaries)
+    #count the steps moving in each piece, from the pieces they start and finish in
+    moving = np.zeros(len(boundaries))
+    np.add.at(moving, np.searchsorted(boundaries, [a.i_min for a in steps if a.frames>0]), 1)
+    np.add.at(moving, np.searchsorted(boundaries, [a.i_max for a in steps if a.frames>0]), -1)
+    moving = np.cumsum(moving)[:-1]>0
+    if (budget==end-start+1 and np.all(lengths[moving]>=minFrames)):
+        return animations
+    
+    #the last frame is budget-1 frames after the first. Every piece is a whole number of frames
+    #long, so no boundary is rounded onto another one
+    spare = budget-1
+    newLengths = np.zeros(len(lengths), dtype=int)
+    for pieces in (moving, ~moving):
+        #the longest pieces get a frame first if there isn't one for each of them
+        order = np.flatnonzero(pieces)[np.argsort(-lengths[pieces], kind='stable')][:spare]
+        newLengths[order] = 1
+        spare -= len(order)
+    if (moving.any()):
+        extra = max(0, min(minFrames-1, spare//moving.sum()))
+        newLengths[moving] += extra
+        spare -= extra*moving.sum()
+    #share out what's left in proportion to the lengths, giving the frames left over by rounding
+    #down to the pieces that lost the most
+    share = spare*lengths/max(lengths.sum(), 1)
+    newLengths += np.floor(share).astype(int)
+    left = spare-int(np.floor(share).sum())
+    newLengths[np.argsort(np.floor(share)-share, kind='stable')[:left]] += 1
+    newBoundaries = start+np.concatenate(([0], np.cumsum(newLengths)))
+    position = {int(frame): int(newFrame) for frame, newFrame in zip(boundaries, newBoundaries)}
+    
+    def warp(frame):
+        if (frame>end):
+            return position[end]+frame-end
+        return position[frame]
+    
+    for a in steps:
+        a.i_min = warp(a.i_min)
+        a.i_max = warp(a.i_max)
+        a.frames = a.i_max-a.i_min
+        if (a.frameToHide>=0):
+            a.frameToHide = warp(a.frameToHide)
+        if (a.frameToUnemphasise>=0):
+            a.frameToUnemphasise = warp(a.frameToUnemphasise)
+    return animations
+
+#Version of the data made by timelineData. Change it whenever the format changes
+timelineVersion = 1
+
+#Convert a value from a step to plain lists and numbers, with points as [x,y]
+def plainValue(value):
+    if (isinstance(value, Point)):
+        return [float(value.x), float(value.y)]
+    if (isinstance(value, (list, tuple))):
+        return [plainValue(v) for v in value]
+    if (isinstance(value, (bool, str)) or value is None):
+        return value
+    if (isinstance(value, (int, np.integer))):
+        return int(value)
+    return float(value)
+
+#Convert a colour or other style value back from plainValue
+def styleValue(value):
+    if (isinstance(value, list)):
+        return tuple(value)
+    return value
+
+#Convert animations to plain data that can be saved as JSON, without any matplotlib artists
+#Each step records its type, start and end (points as [x,y] for lines, lists of two points for
+#line transforms, angles for arcs), its frame range, when it is hidden and unemphasised, and
+#the position of its style in styles, which holds each different style once. Only values that
+#differ from the defaults in Animatable are included
+#A step that is in animations more than once is stored once, with order giving the position in
+#steps of each item in animations
+def timelineData(animations):
+    styles = []
+    styleIds = {}
+    steps = []
+    stepIds = {}
+    order = []
+    for a in animations:
+        if (id(a) not in stepIds):
+            style = {key: plainValue(value) for key, value in a.style.dict().items()}
+            styleKey = json.dumps(style, sort_keys=True)
+            if (styleKey not in styleIds):
+                styleIds[styleKey] = len(styles)
+                styles.append(style)
+
+            step = {'type': a.type.name, 'start': plainValue(a.start), 'end': plainValue(a.end),
+                    'i_min': a.i_min, 'frames': a.frames, 'style': styleIds[styleKey]}
+            if (a.type==arcStep):
+                step['radius'] = plainValue(a.radius)
+                step['centre'] = plainValue(a.centre)
+                step['rotation'] = plainValue(a.rotation)
+            elif (a.type==lineTransformStep):
+                step['angle'] = plainValue(a.angle)
+            elif (a.type==polygonStep):
+                step['points'] = plainValue(a.points)
+                step['initialColor'] = plainValue(a.initialColor)
+            if (not a.startVisible):
+                step['startVisible'] = False
+            if (not a.hide):
+                step['hide'] = False
+            if (a.frameToHide!=-1):
+                step['frameToHide'] = a.frameToHide
+            if (a.frameToUnemphasise!=-1):
+                step['frameToUnemphasise'] = a.frameToUnemphasise
+            stepIds[id(a)] = len(steps)
+            steps.append(step)
+        order.append(stepIds[id(a)])
+
+    data = {'version': timelineVersion, 'styles': styles, 'steps': steps}
+    if (order!=list(range(len(steps)))):
+        data['order'] = order
+    return data
+
+#Make the animations described by data from timelineData, adding them to the current scene
+def timelineFromData(data):
+    if (data.get('version')!=timelineVersion):
+        raise ValueError('Timeline version '+str(data.get('version'))+' is not '+str(timelineVersion))
+    styles = [Style(**{key: styleValue(value) for key, value in style.items()}) for style in data['styles']]
+    scene = currentScene()
+    steps = []
+    for step in data['steps']:
+        start = step['start']
+        end = step['end']
+        if (step['type']=='line'):
+            start = Point(*start)
+            end = Point(*end)
+        elif (step['type']=='lineTransform'):
+            start = [Point(*p) for p in start]
+            end = [Point(*p) for p in end]
+        #keep the frames the timeline was made with, whatever speed is now
+        a = Animatable(step['type'], None, start, end, step['i_min'], step.get('radius', 0), step.get('angle', 0), step['frames'])
+        if (a.type==arcStep):
+            a.centre = tuple(step['centre'])
+            a.rotation = step['rotation']
+        elif (a.type==polygonStep):
+            a.points = step['points']
+            a.initialColor = styleValue(step['initialColor'])
+        a.startVisible = step.get('startVisible', True)
+        a.hide = step.get('hide', True)
+        a.frameToHide = step.get('frameToHide', -1)
+        a.frameToUnemphasise = step.get('frameToUnemphasise', -1)
+        a.setStyle(styles[step['style']])
+        steps.append(scene.add(a))
+    return [steps[i] for i in data.get('order', range(len(steps)))]
+
+#Rotate the points [x,y] in points anticlockwise by angle degrees about the origin, then move
+#them by offset. points can be a single point or a list of them
+def transformPoints(points, angle, offset):
+    if (len(points)>0 and not isinstance(points[0], list)):
+        return transformPoints([points], angle, offset)[0]
+    c = math.cos(math.radians(angle))
+    s = math.sin(math.radians(angle))
+    points = PointArray.fromArray(np.reshape(points, (-1,2)))
+    return PointArray(c*points.x-s*points.y+offset[0], s*points.x+c*points.y+offset[1]).array().tolist()
+
+#The values in each type of step in timelineData that hold points
+pointKeys = {'line': ('start', 'end'), 'lineTransform': ('start', 'end'), 'arc': ('centre',), 'polygon': ('points',)}
+
+#Copy of data from timelineData with every step rotated anticlockwise by angle degrees about
+#the origin, moved by offset and started frameOffset frames later
+#The points of all the steps are transformed together in one array
+def transformTimeline(data, angle, offset, frameOffset):
+    steps = [dict(step) for step in data['steps']]
+    values = []
+    points = []
+    for step in steps:
+        for key in pointKeys.get(step['type'], ()):
+            single = not isinstance(step[key][0], list)
+            values.append((step, key, single))
+            points.extend([step[key]] if single else step[key])
+    points = transformPoints(points, angle, offset)
+    position = 0
+    for step, key, single in values:
+        count = 1 if single else len(step[key])
+        step[key] = points[position] if single else points[position:position+count]
+        position += count
+    
+    for step in steps:
+        if (step['type']=='arc'):
+            step['rotation'] = step['rotation']+angle
+        step['i_min'] = step['i_min']+frameOffset
+        for key in ('frameToHide', 'frameToUnemphasise'):
+            if (key in step):
+                step[key] = step[key]+frameOffset
+    data = dict(data)
+    data['steps'] = steps
+    return data
+
+#Save animations to filename as JSON, in the format made by timelineData
+def saveTimeline(animations, filename):
+    with open(filename, 'w') as f:
+        json.dump(timelineData(animations), f, separators=(',', ':'))
+
+#Load animations saved by saveTimeline, adding them to the current scene
+def loadTimeline(filename):
+    with open(filename) as f:
+        return timelineFromData(json.load(f))
+
 #Find height of triangle, assuming that p1 and p3 are the vertices on the base
 def heightOfTriangle(p1, p2, p3):
     
@@ -394,7 +1026,9 @@ def angleThreePoints(end1,vertex,end2):
     b = distanceBetweenPoints(end2,vertex)
     c = distanceBetweenPoints(end1,end2)
     
-    angle = math.degrees(math.acos((a**2+b**2-c**2)/(2*a*b)))
+    #rounding can take the cosine just outside -1 to 1 when the points are in a line
+    cosine = max(-1.0, min(1.0, (a**2+b**2-c**2)/(2*a*b)))
+    angle = math.degrees(math.acos(cosine))
     
     return angle
 
@@ -426,32 +1060,14 @@ def angleSineRule(l1, a1, l2):
     
     return a2
     
-#Find the angle that the line through p1 and p2 makes with the x axis
+#Find the angle that the line through p1 and p2 makes with the x axis (0 to 360 degrees)
+#A line straight up is 90 and straight down, or from a point to itself, is 270
 def angleWithXAxis(p1,p2):
-    x1=p1.x
-    y1=p1.y
-    x2=p2.x
-    y2=p2.y
-      
-    if (abs(x1-x2)==0):
-        if (y2>y1):
-            angle = 90
-        else:
-            angle = 270
-    elif (abs(y1-y2)==0):
-        if (x2>x1):
-            angle = 0
-        else:
-            angle = 180
-    else:
-        angle = math.degrees(math.atan(abs(y1-y2)/abs(x1-x2)))
-        if (y2<y1 and x2>x1):
-            angle = 360 - angle
-        elif (y2>y1 and x2<x1):
-            angle = 180 - angle
-        elif (y2<y1 and x2<x1):
-            angle = 180 + angle
-    return angle
+    dx = p2.x-p1.x
+    dy = p2.y-p1.y
+    if (dx==0 and dy==0):
+        return 270.0
+    return math.degrees(math.atan2(dy, dx)) % 360
 
 #Return the point reached by extending the line from p1 to p2 by length
 def extendLine(p1,p2,length):
@@ -477,95 +1093,495 @@ def midpoint(p1,p2):
 def circleIntersects(centre1, centre2, radius):
     mp = midpoint(centre1, centre2)
     d = distanceBetweenPoints(centre1, mp)
-    x1 = mp.x + (math.sqrt(radius**2-d**2)*(centre2.y-centre1.y))/(2*d)
-    x2 = mp.x - (math.sqrt(radius**2-d**2)*(centre2.y-centre1.y))/(2*d)
-    y1 = mp.y - (math.sqrt(radius**2-d**2)*(centre2.x-centre1.x))/(2*d)
-    y2 = mp.y + (math.sqrt(radius**2-d**2)*(centre2.x-centre1.x))/(2*d)
-    return [Point(x1,y1),Point(x2,y2)]   
+    h = math.sqrt(radius**2-d**2)
+    x1 = mp.x + (h*(centre2.y-centre1.y))/(2*d)
+    x2 = mp.x - (h*(centre2.y-centre1.y))/(2*d)
+    y1 = mp.y - (h*(centre2.x-centre1.x))/(2*d)
+    y2 = mp.y + (h*(centre2.x-centre1.x))/(2*d)
+    return [Point(x1,y1),Point(x2,y2)]
 
-#animate function is called for each frame, up to the number of frames passed in to FuncAnimation
-#animations is a list of objects of type Animatable
-def animate(frame, animations):
-    objects = []
-    for a in animations:
-        if (frame>=a.i_min and frame<=a.i_max):
-            i = frame - a.i_min
-            if (a.type=='arc'):
-                if (a.end > a.start):
-                    a.obj.theta2 = a.start+((a.end-a.start)/a.frames)*i
-                else:
-                    a.obj.theta1 = a.start/a.frames*(a.i_max-a.i_min-i)
-            elif (a.type=='line'):
-                x = np.linspace(a.start.x, a.start.x+(a.end.x-a.start.x)*i/a.frames, 2)
-                y = np.linspace(a.start.y, a.start.y+(a.end.y-a.start.y)*i/a.frames, 2)
-                a.obj.set_data(x,y)
-            elif (a.type=='lineTransform'):
-                x1=a.start[0].x
-                y1=a.start[0].y
-                x2=a.start[1].x
-                y2=a.start[1].y
-                angle=a.angle*i/a.frames
-                cos=math.cos(math.radians(angle))
-                sin=math.sin(math.radians(angle))
-                x = np.linspace(x1+a.transform[0]*i/a.frames, x1+(x2-x1)*cos-(y2-y1)*sin+a.transform[0]*i/a.frames, 2)
-                y = np.linspace(y1+a.transform[1]*i/a.frames, y1+(x2-x1)*sin+(y2-y1)*cos+a.transform[1]*i/a.frames, 2)
-                a.obj.set_data(x,y)
+#Vectorised versions of the geometry functions above, for points that are already in arrays.
+#Points are passed to them as anything with x and y: a Point, or a PointArray holding the
+#coordinates of lots of points. Lengths and angles can be numbers or arrays. The results are
+#arrays, or PointArrays for points, with the shape the inputs broadcast to
+#The functions for single points don't use them: building a construction goes one point at a
+#time, and NumPy's overhead on a single point makes them several times slower
+
+#Find the heights of triangles, assuming that p1 and p3 are the vertices on the base
+def heightsOfTriangles(p1, p2, p3):
+    
+    a = distancesBetweenPoints(p1,p2)
+    b = distancesBetweenPoints(p2,p3)
+    c = distancesBetweenPoints(p1,p3)
+    
+    #rounding can make the product slightly negative when the points are in a line
+    return 0.5 * np.sqrt(np.maximum((a+b+c)*(b+c-a)*(a-b+c)*(a+b-c), 0))/c
+
+#Find the distances between p1 and p2
+def distancesBetweenPoints(p1,p2):
+    return np.sqrt((p1.x-p2.x)**2 + (p1.y-p2.y)**2)
+
+#Find the angles between the points given (0 to 180 degrees)
+def anglesThreePoints(end1,vertex,end2):
+    
+    a = distancesBetweenPoints(end1,vertex)
+    b = distancesBetweenPoints(end2,vertex)
+    c = distancesBetweenPoints(end1,end2)
+    
+    return np.degrees(np.arccos(np.clip((a**2+b**2-c**2)/(2*a*b), -1, 1)))
+
+#Find the anticlockwise angles from end1 to end2 around vertex (0 to 360 degrees)
+def anticlockwiseAnglesThreePoints(end1,vertex,end2):
+    x1 = end1.x-vertex.x
+    y1 = end1.y-vertex.y
+    x2 = end2.x-vertex.x
+    y2 = end2.y-vertex.y
+    
+    return (np.degrees(np.arctan2(x1*y2-y1*x2, x1*x2+y1*y2)) + 360) % 360
+
+#Find the angles that the lines through p1 and p2 make with the x axis (0 to 360 degrees)
+#A line straight up is 90 and straight down, or from a point to itself, is 270
+def anglesWithXAxis(p1,p2):
+    dx = p2.x-p1.x
+    dy = p2.y-p1.y
+    
+    angle = np.degrees(np.arctan2(dy, dx)) % 360
+    return np.where((dx==0) & (dy==0), 270.0, angle)
+
+#Return the points reached by extending the lines from p1 to p2 by length
+def extendLines(p1,p2,length):
+    angle = np.radians(anglesWithXAxis(p1,p2))
+    return PointArray(p2.x+length*np.cos(angle), p2.y+length*np.sin(angle))
+
+#Return the points reached by extending the lines from p1 by length at angle to x axis
+def extendLinesAngle(p1,length,angle):
+    angle = np.radians(angle)
+    return PointArray(p1.x+length*np.cos(angle), p1.y+length*np.sin(angle))
+
+#Find the midpoints of p1 and p2
+def midpoints(p1,p2):
+    return PointArray((p1.x+p2.x)/2, (p1.y+p2.y)/2)
+
+#Find the points where the circles with centre1 and centre2 intersect, assuming that radius is
+#the same for both circles. Returns two PointArrays, one for each intersection
+def circlesIntersects(centre1, centre2, radius):
+    mp = midpoints(centre1, centre2)
+    d = distancesBetweenPoints(centre1, mp)
+    h = np.sqrt(radius**2-d**2)
+    x1 = mp.x + (h*(centre2.y-centre1.y))/(2*d)
+    x2 = mp.x - (h*(centre2.y-centre1.y))/(2*d)
+    y1 = mp.y - (h*(centre2.x-centre1.x))/(2*d)
+    y2 = mp.y + (h*(centre2.x-centre1.x))/(2*d)
+    return [PointArray(x1,y1), PointArray(x2,y2)]
+
+#Geometry of every frame of every line, lineTransform and arc animation, worked out for the
+#whole list of animations in one go with NumPy so that animate only has to look it up.
+#Each animation gets frames+1 rows, one for each value of i in animate. The row for frame is
+#rows[a]+frame-a.i_min
+#segments[row] is [[x1,x2],[y1,y2]], ready to pass to set_data of a line
+#rotations[row] is the rotation matrix applied to a lineTransform on that frame
+#thetas[row] is theta2 for an anti-clockwise arc or theta1 for a clockwise one
+class Keyframes:
+    def __init__(self, animations):
+        self.rows = {}
+        lines = [a for a in animations if a.type==lineStep]
+        transforms = [a for a in animations if a.type==lineTransformStep]
+        arcs = [a for a in animations if a.type==arcStep]
+        
+        #lines and lineTransforms share the segments table, lines first
+        lineCounts, lineI, lineFrames = self.addRows(lines, 0)
+        transformCounts, transformI, transformFrames = self.addRows(transforms, len(lineI))
+        arcCounts, arcI, arcFrames = self.addRows(arcs, 0)
+        
+        #lines grow from start to end
+        start = np.repeat(pointArray([a.start for a in lines]), lineCounts, axis=0)
+        end = np.repeat(pointArray([a.end for a in lines]), lineCounts, axis=0)
+        lineSegments = np.empty((len(lineI),2,2))
+        lineSegments[:,:,0] = start
+        lineSegments[:,:,1] = start+(end-start)*lineI[:,None]/lineFrames[:,None]
+        
+        #lineTransforms rotate about their first point while it moves by transform
+        start1 = np.repeat(pointArray([a.start[0] for a in transforms]), transformCounts, axis=0)
+        start2 = np.repeat(pointArray([a.start[1] for a in transforms]), transformCounts, axis=0)
+        move = np.repeat(np.array([a.transform for a in transforms], dtype=float).reshape(-1,2), transformCounts, axis=0)
+        move = move*transformI[:,None]/transformFrames[:,None]
+        angle = np.repeat(np.array([a.angle for a in transforms], dtype=float), transformCounts)
+        angle = np.radians(angle*transformI/transformFrames)
+        cos = np.cos(angle)
+        sin = np.sin(angle)
+        self.rotations = np.empty((len(transformI),2,2))
+        self.rotations[:,0,0] = cos
+        self.rotations[:,0,1] = -sin
+        self.rotations[:,1,0] = sin
+        self.rotations[:,1,1] = cos
+        rotated = np.einsum('nij,nj->ni', self.rotations, start2-start1)
+        transformSegments = np.empty((len(transformI),2,2))
+        transformSegments[:,:,0] = start1+move
+        transformSegments[:,:,1] = start1+rotated+move
+        
+        self.segments = np.concatenate((lineSegments, transformSegments))
+        
+        #anti-clockwise arcs move theta2 from start to end, clockwise arcs move theta1 from start to 0
+        start = np.repeat(np.array([a.start for a in arcs], dtype=float), arcCounts)
+        end = np.repeat(np.array([a.end for a in arcs], dtype=float), arcCounts)
+        self.thetas = np.where(end>start, start+((end-start)/arcFrames)*arcI, start/arcFrames*(arcFrames-arcI))
+        
+    #Give each of animations frames+1 rows, starting at row
+    #Returns the number of rows for each animation, and i and frames for every row.
+    #An animation with no frames is shown finished straight away
+    def addRows(self, animations, row):
+        counts = np.array([a.frames+1 for a in animations], dtype=int)
+        for a in animations:
+            self.rows[a] = row
+            row += a.frames+1
+        offsets = np.cumsum(counts)-counts
+        i = np.arange(counts.sum())-np.repeat(offsets, counts)
+        frames = np.repeat(counts-1, counts)
+        i = np.where(frames==0, 1, i)
+        frames = np.where(frames==0, 1, frames)
+        return counts, i, frames
+    
+    #Bounding box (xMin, yMin, xMax, yMax) of everything steps draw on any frame: every position
+    #of their lines and lineTransforms, their arcs when finished and their polygons, or None if
+    #they don't draw anything. steps must be among the animations the keyframes were made from
+    def bounds(self, steps):
+        xs = []
+        ys = []
+        segmented = [a for a in steps if a.type==lineStep or a.type==lineTransformStep]
+        if (len(segmented)>0):
+            counts = np.array([a.frames+1 for a in segmented], dtype=int)
+            first = np.array([self.rows[a] for a in segmented], dtype=int)
+            offsets = np.cumsum(counts)-counts
+            rows = np.arange(counts.sum())+np.repeat(first-offsets, counts)
+            xs.append(self.segments[rows,0].ravel())
+            ys.append(self.segments[rows,1].ravel())
+        
+        #arcs only grow, so the last row of each is all of it. It's drawn anticlockwise from
+        #theta1 to theta2, so its box is made by those ends and the points straight right, up,
+        #left and down from the centre that are on the way
+        arcs = [a for a in steps if a.type==arcStep]
+        if (len(arcs)>0):
+            theta = self.thetas[np.array([self.rows[a]+a.frames for a in arcs], dtype=int)]
+            start = np.array([a.start for a in arcs], dtype=float)
+            end = np.array([a.end for a in arcs], dtype=float)
+            theta1 = np.where(end>start, start, theta)
+            theta2 = np.where(end>start, theta, start)
+            sweep = (theta2-theta1)%360
+            sweep = np.where((sweep==0) & (theta2!=theta1), 360, sweep)
+            first = np.array([a.rotation for a in arcs], dtype=float)+theta1
+            toCardinal = (np.array([0,90,180,270])[None,:]-first[:,None])%360
+            angles = np.concatenate((first[:,None], (first+sweep)[:,None],
+                                     np.where(toCardinal<=sweep[:,None], first[:,None]+toCardinal, first[:,None])), axis=1)
+            centres = PointArray.fromArray(np.array([a.centre for a in arcs], dtype=float).reshape(-1,1,2))
+            radii = np.array([a.radius for a in arcs], dtype=float)[:,None]
+            ends = extendLinesAngle(centres, radii, angles)
+            xs.append(ends.x.ravel())
+            ys.append(ends.y.ravel())
+        
+        polygons = [a for a in steps if a.type==polygonStep]
+        if (len(polygons)>0):
+            points = np.concatenate([np.asarray(a.points, dtype=float).reshape(-1,2) for a in polygons])
+            xs.append(points[:,0])
+            ys.append(points[:,1])
+        
+        if (len(xs)==0):
+            return None
+        xs = np.concatenate(xs)
+        ys = np.concatenate(ys)
+        return (float(xs.min()), float(ys.min()), float(xs.max()), float(ys.max()))
+
+#Index of which animations change on which frames, built once from the list of animations so
+#that moving from one frame to another only has to look at the animations that change.
+#Frames can be visited in any order.
+#active[frame] holds the indices of the animations that are active on that frame (i_min to i_max)
+#eventFrames holds every frame on which an animation starts, finishes, is hidden or is
+#unemphasised, in order, and eventSteps holds the index of the animation for each one
+class Schedule:
+    def __init__(self, animations):
+        import Artists
+        self.animations = animations
+        createArtists(animations)
+        #Steps drawn by the LineBatches of their scene, rather than by an artist of their own
+        self.batched = set()
+        self.lineBatches = []
+        #Steps that only have an artist from the ArtistPool of their scene while they can be seen
+        self.pooled = set()
+        self.pools = []
+        for index, a in enumerate(animations):
+            if (isinstance(a.obj, Artists.BatchedLine)):
+                self.batched.add(index)
+                if (a.obj.batches not in self.lineBatches):
+                    self.lineBatches.append(a.obj.batches)
+            elif (a.scene is not None and a.scene.artistPool is not None and not a.ownArtist):
+                self.pooled.add(index)
+                if (a.scene.artistPool not in self.pools):
+                    self.pools.append(a.scene.artistPool)
+        self.keyframes = Keyframes(animations)
+        #fix the view of each scene to everything its steps draw, so that every frame is laid out
+        #the same whichever order the frames are drawn in, and by whichever process
+        scenes = {}
+        for a in animations:
+            if (a.scene is not None):
+                scenes.setdefault(id(a.scene), (a.scene, []))[1].append(a)
+        for scene, steps in scenes.values():
+            scene.fixLimits(self.keyframes.bounds(steps))
+        
+        lastFrame = -1
+        for a in animations:
+            lastFrame = max(lastFrame, a.i_max)
+        self.active = [[] for frame in range(lastFrame+1)]
+        frames = []
+        steps = []
+        for index, a in enumerate(animations):
+            for frame in range(max(a.i_min,0), a.i_max+1):
+                self.active[frame].append(index)
+            for frame in (a.i_min, a.i_max, a.frameToHide, a.frameToUnemphasise):
+                if (frame>=0):
+                    frames.append(frame)
+                    steps.append(index)
+        order = np.argsort(frames, kind='stable')
+        self.eventFrames = np.array(frames, dtype=int)[order]
+        self.eventSteps = np.array(steps, dtype=int)[order]
+        
+        #The frame the artists are currently showing. None means this schedule hasn't set them
+        #yet, so the first seek has to look at every animation
+        self.frame = None
+        #Indices of the animations that changed in the last seek
+        self.changedSteps = []
+        
+        #animate used to set the style of every animation on every frame. Count how many of
+        #those property writes are skipped now that styles are only set when they change
+        self.writesPerFrame = sum(a.styleWrites() for a in animations)
+        self.skippedWrites = 0
+        
+    #The matplotlib artists that draw the animations: the artist of each step that has one, the
+    #idle artists in the pools, then the LineCollections drawing the batched lines. The pools and
+    #collections change as the artists are set
+    @property
+    def artists(self):
+        artists = [a.obj for index, a in enumerate(self.animations) if a.obj is not None and index not in self.batched]
+        for pool in self.pools:
+            artists.extend(pool.artists())
+        for batches in self.lineBatches:
+            artists.extend(batches.collections())
+        return artists
+    
+    #Frames first to last-1 split into runs of frames that look the same, so that each run only
+    #has to be drawn once. It's worked out from the timeline alone, without setting any artists:
+    #arcs and lineTransforms move on every frame from i_min to i_max, and lines on every frame
+    #after i_min, as they have no length on it. Polygons only change when they're shown, hidden
+    #or unemphasised. last defaults to the end of the animations
+    #Returns (frame, count) for each run, where frame is its first frame
+    def runs(self, first=0, last=None):
+        if (last is None):
+            last = len(self.active)
+        length = last-first
+        starts = []
+        ends = []
+        events = [first]
+        for a in self.animations:
+            if (a.type==polygonStep or a.frames==0):
+                events.append(a.i_min)
+            elif (a.type==lineStep):
+                starts.append(a.i_min+1)
+                ends.append(a.i_max+1)
+            else:
+                starts.append(a.i_min)
+                ends.append(a.i_max+1)
+            events.extend((a.frameToHide, a.frameToUnemphasise))
+        changes = np.zeros(length+1, dtype=int)
+        np.add.at(changes, np.clip(np.array(starts, dtype=int)-first, 0, length), 1)
+        np.add.at(changes, np.clip(np.array(ends, dtype=int)-first, 0, length), -1)
+        changed = np.cumsum(changes)[:-1]>0
+        events = np.array(events, dtype=int)
+        changed[events[(events>=first) & (events<last)]-first] = True
+        frames = np.flatnonzero(changed)
+        counts = np.diff(np.append(frames, length))
+        return list(zip((frames+first).tolist(), counts.tolist()))
+        
+    #The state of every animation at frame (see Animatable.stateAt). Doesn't change anything
+    def stateAt(self, frame):
+        return [a.stateAt(frame) for a in self.animations]
+    
+    #Indices of the animations that can look different at frame to how they look now: the
+    #ones active at frame, and the ones with an event between the current frame and frame
+    def changing(self, frame):
+        if (self.frame is None):
+            return range(len(self.animations))
+        low = min(self.frame, frame)
+        high = max(self.frame, frame)
+        start = np.searchsorted(self.eventFrames, low, side='right')
+        end = np.searchsorted(self.eventFrames, high, side='right')
+        indices = set(self.eventSteps[start:end].tolist())
+        if (frame>=0 and frame<len(self.active)):
+            indices.update(self.active[frame])
+        return sorted(indices)
+    
+    #Set every artist to how it should look at frame
+    #Returns the artists whose geometry, visibility or style changed, and keeps the indices of
+    #their animations in changedSteps
+    def seek(self, frame):
+        writes = 0
+        objects = []
+        self.changedSteps = []
+        indices = self.changing(frame)
+        states = [self.animations[index].stateAt(frame) for index in indices]
+        if (len(self.pooled)>0):
+            #hand back the artists of the steps that can't be seen first, so that the steps that
+            #can be seen take those instead of making more
+            for index, state in zip(indices, states):
+                a = self.animations[index]
+                if (index in self.pooled and a.obj is not None and not self.onScreen(a, state)):
+                    objects.append(a.obj)
+                    self.changedSteps.append(index)
+                    a.scene.releaseArtist(a)
+        for index, (i, visible, emphasised) in zip(indices, states):
+            a = self.animations[index]
+            if (index in self.pooled and a.obj is None):
+                if (not self.onScreen(a, (i, visible, emphasised))):
+                    continue
+                a.scene.acquireArtist(a)
+            changed = False
+            if (i != a.shown):
+                a.shown = i
+                changed = self.setGeometry(a, i)
+            if (a.setVisible(visible)>0):
+                changed = True
+            styleWrites = a.applyStyle(emphasised)
+            writes += styleWrites
+            if (changed or styleWrites>0):
+                self.changedSteps.append(index)
+                if (index not in self.batched):
+                    objects.append(a.obj)
+        for batches in self.lineBatches:
+            objects.extend(batches.flush())
+        if (len(self.pooled)>0):
+            #an artist handed back can have been taken by another step straight away
+            objects = list(dict.fromkeys(objects))
+        self.frame = frame
+        self.skippedWrites += self.writesPerFrame-writes
+        return objects
+    
+    #Whether a, in state from stateAt, draws anything and so needs an artist: it's visible, and
+    #is a polygon or has started
+    def onScreen(self, a, state):
+        i, visible, emphasised = state
+        return visible and (i>=0 or a.type==polygonStep)
+    
+    #Set the geometry of a's artist to how it looks at i (-1 is before it starts)
+    #Returns whether there is any geometry to set
+    def setGeometry(self, a, i):
+        keyframes = self.keyframes
+        if (a.type==arcStep):
+            theta = keyframes.thetas[keyframes.rows[a]+max(i,0)]
+            if (a.end > a.start):
+                theta1, theta2 = a.start, theta
             else:
-                a.obj.set_visible(True)
-                
-        if (a.frameToHide == frame and a.hide == True):
-            a.obj.set_visible(False)
-        
-        if (frame<a.frameToUnemphasise):
-            a.obj.set_color(a.style.emphColour)
-            a.obj.set_linestyle(a.style.emphLineStyle)
-            a.obj.set_linewidth(a.style.emphLineWidth)
-            if (a.type=='polygon'):
-                a.obj.set_facecolor(a.style.emphFaceColour)
-                a.obj.set_edgecolor(a.style.emphEdgeColour)
+                theta1, theta2 = theta, a.start
+            if (hasattr(a.obj, 'setAngles')):
+                a.obj.setAngles(theta1, theta2)
+            else:
+                #a matplotlib Arc makes its path from these when it's drawn
+                a.obj.theta1 = theta1
+                a.obj.theta2 = theta2
+                a.obj.stale = True
+        elif (a.type==lineStep or a.type==lineTransformStep):
+            if (i<0):
+                a.obj.set_data([], [])
+            else:
+                segment = keyframes.segments[keyframes.rows[a]+i]
+                a.obj.set_data(segment[0], segment[1])
         else:
-            a.obj.set_color(a.style.stdColour)
-            a.obj.set_linestyle(a.style.stdLineStyle)
-            a.obj.set_linewidth(a.style.stdLineWidth)
-            if (a.type=='polygon'):
-                a.obj.set_facecolor(a.style.stdFaceColour)
-                a.obj.set_edgecolor(a.style.stdEdgeColour)
-            
-        objects.append(a.obj)
-    
-    return objects
+            return False
+        return True
+
+#animate function is called for each frame, up to the number of frames passed in to FuncAnimation
+#animations is a list of objects of type Animatable
+#schedule is the Schedule built from animations. If it isn't passed in it is built here, which
+#is slow if animate is called for lots of frames
+#profiler is a Profiling.FrameProfiler to record the frame in, or None
+#Returns the artists whose geometry, visibility or style changed on this frame
+def animate(frame, animations, schedule=None, profiler=None):
+    if (schedule is None):
+        schedule = Schedule(animations)
+    if (profiler is None):
+        return schedule.seek(frame)
+    start = time.perf_counter()
+    changed = schedule.seek(frame)
+    profiler.updated(frame, schedule, time.perf_counter()-start)
+    return changed
 
-def performAnimation(animations, saveAsMP4=False, saveAsGIF=False, filename=''):
+#Show animations, optionally saving them as an MP4 or GIF called filename first
+#They are shown in the current scene, or in scene if it's given. Only the default scene can be
+#shown in a window; other scenes can only be saved
+#The MP4 is written by Export.saveMP4, which pipes frames straight into ffmpeg. processes is
+#the number of processes to render it with, and pixelFormat, crf and preset are passed to ffmpeg
+#The GIF is written by Export.saveGIF
+#show=False saves without opening a window
+#profiler is a Profiling.FrameProfiler to record every frame saved or shown in, or None. An MP4
+#is rendered in this process when it's profiled
+#Everything is played and saved at fps frames per second. If duration (in seconds) or maxFrames
+#is given, the animations are first changed by fitTimeline to fit, with at least minFrames
+#frames for each step if there's room
+def performAnimation(animations, saveAsMP4=False, saveAsGIF=False, filename='', processes=1, show=True,
+                     pixelFormat='yuv420p', crf=23, preset='medium', scene=None, profiler=None,
+                     fps=5, duration=None, maxFrames=None, minFrames=1):
+    
+    if (scene is None):
+        scene = currentScene()
+    fig = scene.fig
+    ax = scene.ax
     
     # First set up the figure, the axis, and the plot element we want to animate
     #fig = plt.figure()
     #ax = plt.axes()
     #ax = plt.axes(xlim=(-5, 5), ylim=(-5, 5))
     ax.axes.set_aspect('equal')
-    plt.tight_layout()
+    fig.tight_layout()
     #plt.grid(b=True)
     #line, = ax.plot([], [])
     #ax.axes.get_xaxis().set_visible(False)
     #ax.axes.get_yaxis().set_visible(False)
     
+    if (duration is not None or maxFrames is not None):
+        fitTimeline(animations, duration, maxFrames, fps, minFrames)
     frames = animations[-1].i_max+1
-    anim = animation.FuncAnimation(fig, animate, fargs = [animations], frames=frames, interval=200, blit=True, repeat=False)  
+    interval = 1000/fps
     
-    #plt.axis('scaled')
-    
-    # save the animation as an mp4.  This requires ffmpeg or mencoder to be
-    # installed.  The extra_args ensure that the x264 codec is used, so that
-    # the video can be embedded in html5.  You may need to adjust this for
-    # your system: for more information, see
-    # http://matplotlib.sourceforge.net/api/animation_api.html
+    # save the animation as an mp4.  This requires ffmpeg to be installed.  libx264 is used,
+    # so that the video can be embedded in html5
     if (saveAsMP4==True):
-        anim.save(filename+'.mp4', extra_args=['-vcodec', 'libx264'])
-        
+        import Export
+        Export.saveMP4(fig, animations, filename+'.mp4', processes, fps=fps,
+                       pixelFormat=pixelFormat, crf=crf, preset=preset, profiler=profiler)
+    
+    # save the animation as a GIF, encoded here without needing imagemagick
     if (saveAsGIF==True):
-        print('saveasgif')
-        anim.save(filename+'.gif', writer='imagemagick', fps=60)
+        import Export
+        Export.saveGIF(fig, animations, filename+'.gif', fps=fps, profiler=profiler)
+    
+    import Playback
+    schedule = Schedule(animations)
+    anim = Playback.ConstructionAnimation(fig, animate, schedule, fargs = [animations, schedule, profiler], frames=frames, interval=interval,
+                                          blit=True, repeat=False, profiler=profiler)  
     
+    #plt.axis('scaled')
+        
     
-    plt.show()
+    if (show==True and fig.canvas.manager is not None):
+        from matplotlib import pyplot as plt
+        plt.show()
     
     return anim
+
+#Builder functions that can also be called on a scene, to build in that scene
+def sceneMethod(builder):
+    def method(self, *args, **kwargs):
+        return self.build(builder, *args, **kwargs)
+    method.__name__ = builder.__name__
+    return method
+
+for builder in [addStepArc, addStepPolygon, addStepDrawPolygon, addStepLine, addStepLineTransform,
+                perpendicularBisector, perpendicularThroughPointOnLine, parallelLineThroughPoint,
+                centreOfCircle, performAnimation]:
+    setattr(Scene, builder.__name__, sceneMethod(builder))
@@ -24,15 +24,102 @@ website: www.samhartburn.co.uk
 """
 
 import RulerCompassAnimations as rc
+import Triangulation
 import math
+import os
+import json
+import hashlib
+import tempfile
+import threading
+import collections
 
 
+#Least recently used cache of construction plans, holding at most maxSize of them. Plans are
+#stored as data from rc.timelineData, so that they can be turned into new steps each time
+#hits, misses and evictions count how it has been used
+class PlanCache:
+    def __init__(self, maxSize=256):
+        self.maxSize = maxSize
+        self.plans = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+    #The plan stored for key, or None if there isn't one
+    def get(self, key):
+        with self.lock:
+            plan = self.plans.get(key)
+            if (plan is None):
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.plans.move_to_end(key)
+            return plan
+    
+    def put(self, key, plan):
+        with self.lock:
+            self.plans[key] = plan
+            self.plans.move_to_end(key)
+            while (len(self.plans)>self.maxSize):
+                self.plans.popitem(last=False)
+                self.evictions += 1
+                
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'size': len(self.plans), 'maxSize': self.maxSize}
+    
+    def clear(self):
+        with self.lock:
+            self.plans.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+#The plans of the triangles and rectangles squared by squareTriangle and squareRectangle
+planCache = PlanCache()
+
+#Run builder, one of the functions below that takes points and i_start and returns a list of
+#animations and the points of a square, using planCache
+#The same shape moved or rotated, starting at any frame, has the same plan apart from its
+#position and frames, so the plan is cached for the shape moved so that points[0] is at the
+#origin and rotated so that points[1] is on the positive x axis, starting at frame 0. It is
+#then rotated and moved back into place, and started at i_start
+def cachedPlan(builder, points, i_start):
+    angle = rc.angleWithXAxis(points[0], points[1])
+    offset = [points[0].x, points[0].y]
+    shape = rc.transformPoints([[p.x-offset[0], p.y-offset[1]] for p in points], -angle, [0,0])
+    #rounding lets copies that only differ by rounding errors share a plan. Adding 0.0 turns -0.0 into 0.0
+    key = (builder.__name__, rc.speed, tuple(round(value, 9)+0.0 for point in shape for value in point))
+    
+    plan = planCache.get(key)
+    if (plan is None):
+        #build the plan in a scene of its own, which is thrown away
+        square = rc.Scene().build(builder, *[rc.Point(x, y) for x, y in shape], 0)
+        plan = (rc.timelineData(square[0]), rc.plainValue(square[1]))
+        planCache.put(key, plan)
+        
+    timeline, square = plan
+    animations = rc.timelineFromData(rc.transformTimeline(timeline, angle, offset, i_start))
+    return [animations, [rc.Point(x, y) for x, y in rc.transformPoints(square, angle, offset)]]
+
+#Hits, misses and evictions of planCache
+def planCacheStats():
+    return planCache.stats()
+
+#Create a set of animations to show construction of a square with the same area
+#as the rectangle defined by p1,p2,p3,p4.
+#Plans are cached by cachedPlan
+def squareRectangle(p1,p2,p3,p4,i_start):
+    return cachedPlan(buildSquareRectangle, [p1,p2,p3,p4], i_start)
+
 #Create a set of animations to show construction of a square with the same area
 #as the rectangle defined by p1,p2,p3,p4.
 #i_start is the frame the animation should start at
 #Returns a list: first item is a list of the animations reqired
 #second item is a list containing the four points of the square
-def squareRectangle(p1,p2,p3,p4,i_start):
+def buildSquareRectangle(p1,p2,p3,p4,i_start):
        
     #find out about the rectangle
     shortEdge = rc.distanceBetweenPoints(p3,p4)
@@ -192,12 +279,18 @@ def squareRectangle(p1,p2,p3,p4,i_start):
     
     return [animations, [squareP1,squareP2,squareP3,squareP4]]
 
+#Create a set of animations to show construction of a square with the same area
+#as the triangle defined by p1,p2,p3
+#Plans are cached by cachedPlan
+def squareTriangle(p1,p2,p3, i_start):
+    return cachedPlan(buildSquareTriangle, [p1,p2,p3], i_start)
+
 #Create a set of animations to show construction of a square with the same area
 #as the triangle defined by p1,p2,p3
 #i_start is the frame the animation should start at
 #Returns a list: first item is a list of the animations reqired
 #second item is a list containing the four points of the square
-def squareTriangle(p1,p2,p3, i_start):
+def buildSquareTriangle(p1,p2,p3, i_start):
     
     #Find height and base of desired rectangle
     height = rc.heightOfTriangle(p1,p2,p3)
@@ -281,48 +374,32 @@ def squareTriangle(p1,p2,p3, i_start):
     
     #construct square with same area as rectangle
     #if (height>base):
-        square=squareRectangle(p1,mp,corner3,corner4, animations[-1].i_max+1)
+    square=squareRectangle(p1,mp,corner3,corner4, animations[-1].i_max+1)
     #else:
         #square=squareRectangle(mp,corner3,corner4,basePoint, animations[-1].i_max+1)
     animations.extend(square[0])
         
     return [animations, square[1]]
 
-#Create a set of animations to show construction of a square with the same area
-#as the polygon defined by points
-#Returns a list of the animations reqired
-#second item is a list containing the four points of the square
-def squarePolygon(*points, i_start):
-    
-    #draw diagonals from first vertex to other vertices
-    animations=[rc.addStepLine(points[0], points[2], i_start)]
-    maxX = points[0].x
-    minY = points[0].y
-    for i in range(3, len(points)):
-        animations.append(rc.addStepLine(points[0], points[i], animations[-1].i_max+1))
-    
-    #the diagonals create triangles. Construct square with same area as each triangle
-    lineTransforms = []       
-    for i in range(2, len(points)):
-        triangle = rc.addStepPolygon([points[0],points[i-1],points[i]], (0,0.45,0.7,1), False, animations[-1].i_max+1,1)
-        triangle.setStyle(rc.Style(stdFaceColour=(0.84,0.37,0,1),stdLineStyle='-'))
-        triangle.hide = True
-        animations.append(triangle)
-        triangleIndex=len(animations)-1
-        square = squareTriangle(points[0], points[i-1], points[i], animations[-1].i_max+1)
-        animations.extend(square[0])
-        animations[triangleIndex].frameToHide=animations[-1].i_max
-        #save details of the first line of the square just created
-        lineTransforms.append(rc.LineTransform(square[1][0], square[1][1]))
-        if (points[i].x > maxX):
-            maxX = points[i].x
-        if (points[i].y < minY):
-            minY = points[i].y
-        for i in range(1,3):
-            if (square[1][i].x > maxX):
-                maxX = square[1][i].x
+#The final square when there's only one triangle, which is that triangle's square with corners
+#squareCorners, so nothing needs to be combined. Returns the same as combineSquaresChain
+def singleSquare(animations, squareCorners):
+    finalSquareP1, finalSquareP2, finalSquareP3 = squareCorners[:3]
+    finalSquareLength = rc.distanceBetweenPoints(finalSquareP1, finalSquareP2)
+    finalSquareAngle = rc.angleWithXAxis(finalSquareP2, finalSquareP3)-90
+    return [finalSquareP1, finalSquareP2, finalSquareLength, finalSquareAngle, len(animations), []]
+
+#Put the edges of the squares in lineTransforms together one at a time with Pythagoras' theorem:
+#each edge is moved to the end of the one before last, at right angles to the line joining the
+#last two, and the ends are joined. The moves start to the right of maxX, level with minY
+#squares are the corners of each of the squares, which is used instead if there's only one
+#Adds the animations to animations. Returns the two ends of the side of the final square, its
+#length and angle, the index in animations where the steps of the final square start and the
+#indices of the steps to leave emphasised until the end
+def combineSquaresChain(animations, lineTransforms, squares, maxX, minY):
+    if (len(lineTransforms)==1):
+        return singleSquare(animations, squares[0])
     
-    #now use the edges of the squares that we've saved, and Pythagoras' theorem, to calculate the length of the final square
     #Find where first two edges should move to, put them at right angles with each other
     initialPoint = rc.Point(maxX+1, minY)
     lineTransforms[0].setEndPoint(initialPoint,(-1*lineTransforms[0].angleWithX)%360)
@@ -355,10 +432,143 @@ def squarePolygon(*points, i_start):
     finalSquareP1 = lineTransforms[-2].pos2End
     finalSquareP2 = lineTransforms[-1].pos2End
     finalSquareLength = rc.distanceBetweenPoints(finalSquareP1, finalSquareP2)
-    if (len(points)%2==0):
+    #the side the square goes on depends on whether the last edge was moved clockwise or
+    #anticlockwise of the line before it, which alternates with each edge. This goes by the number
+    #of triangles rather than of vertices, as collinear vertices don't make a triangle
+    if (len(lineTransforms)%2==0):
         finalSquareAngle = rc.angleWithXAxis(finalSquareP2, finalSquareP1)
     else:
         finalSquareAngle = rc.angleWithXAxis(finalSquareP1, finalSquareP2)
+    
+    return [finalSquareP1, finalSquareP2, finalSquareLength, finalSquareAngle, step1EndIndex, stepsUsedAtEnd]
+
+#Put the edges of the squares in lineTransforms together in a balanced tree with Pythagoras'
+#theorem: the edges are taken in pairs, the two edges of each pair moved to their own corner at
+#right angles to each other and their ends joined, and the joining lines are the edges of the
+#next level. An edge without a pair waits for the next level. The pairs of a level don't depend
+#on each other, so they're all moved at the same time and then all joined at the same time
+#The corners of each level are in a column to the right of maxX, starting level with minY
+#squares are the corners of each of the squares, which is used instead if there's only one
+#Adds the animations to animations. Returns the same as combineSquaresChain
+def combineSquaresTree(animations, lineTransforms, squares, maxX, minY):
+    if (len(lineTransforms)==1):
+        return singleSquare(animations, squares[0])
+    
+    edges = lineTransforms
+    #the step that drew each edge, which is unemphasised once the edge has been used
+    drawnBy = [None]*len(edges)
+    cornerX = maxX+1
+    levelStart = animations[-1].i_max+1
+    while (len(edges)>1):
+        #move both edges of every pair to their corner
+        cornerY = minY
+        width = 0
+        moves = []
+        for i in range(0, len(edges)-1, 2):
+            corner = rc.Point(cornerX, cornerY)
+            edges[i].setEndPoint(corner,(-1*edges[i].angleWithX)%360)
+            edges[i+1].setEndPoint(corner,(90-edges[i+1].angleWithX)%360)
+            moves.append(rc.addStepLineTransform(edges[i], levelStart))
+            moves.append(rc.addStepLineTransform(edges[i+1], levelStart))
+            cornerY += edges[i+1].length+1
+            width = max(width, edges[i].length)
+        animations.extend(moves)
+        
+        #join the ends of each pair once they've all moved
+        joinStart = max(a.i_max for a in moves)+1
+        joins = []
+        nextEdges = []
+        for i in range(0, len(edges)-1, 2):
+            joins.append(rc.addStepLine(edges[i].pos2End, edges[i+1].pos2End, joinStart))
+            for a in (moves[i], moves[i+1], drawnBy[i], drawnBy[i+1]):
+                if (a is not None):
+                    a.frameToUnemphasise=joins[-1].i_max
+            nextEdges.append(rc.LineTransform(edges[i].pos2End, edges[i+1].pos2End))
+        animations.extend(joins)
+        if (len(edges)%2==1):
+            nextEdges.append(edges[-1])
+            joins.append(drawnBy[-1])
+        
+        levelStart = max(a.i_max for a in joins if a is not None)+1
+        finalEdges = edges
+        edges = nextEdges
+        drawnBy = joins
+        cornerX += width+1
+    
+    #We don't want to unemphasise the final line until the end
+    step1EndIndex=len(animations)
+    stepsUsedAtEnd=[len(animations)-1]
+    
+    #find the vertices of the final square, on the other side of the last join from its corner
+    finalSquareP1 = finalEdges[0].pos2End
+    finalSquareP2 = finalEdges[1].pos2End
+    finalSquareLength = rc.distanceBetweenPoints(finalSquareP1, finalSquareP2)
+    finalSquareAngle = rc.angleWithXAxis(finalSquareP2, finalSquareP1)
+    
+    return [finalSquareP1, finalSquareP2, finalSquareLength, finalSquareAngle, step1EndIndex, stepsUsedAtEnd]
+
+#Create a set of animations to show construction of a square with the same area
+#as the polygon defined by points
+#combine is how the edges of the triangles' squares are put together with Pythagoras' theorem:
+#'chain' adds them one at a time, 'tree' joins them in pairs, with every pair of a level moved at
+#the same time, so the timeline grows with the log of the number of triangles instead of linearly
+#Returns a list of the animations reqired
+#second item is a list containing the four points of the square
+def squarePolygon(*points, i_start, combine='chain'):
+    if (combine not in ('chain', 'tree')):
+        raise ValueError('Unknown way to combine the squares '+str(combine))
+    
+    #a convex polygon is split into triangles by diagonals from the first vertex to the others.
+    #Any other simple polygon is split by Triangulation, which raises ValueError if it isn't one
+    maxX = points[0].x
+    minY = points[0].y
+    if (Triangulation.isConvex(points)):
+        #corners where the polygon goes straight on would make triangles with no area, so
+        #they're left out, as Triangulation leaves out collinear vertices
+        triangles = [(0, i-1, i) for i in range(2, len(points))
+                     if Triangulation.cross(points[0].x, points[0].y, points[i-1].x, points[i-1].y, points[i].x, points[i].y)!=0]
+        diagonals = [(0, c) for a, b, c in triangles]
+    else:
+        triangles = Triangulation.triangulate(points)
+        diagonals = Triangulation.diagonals(triangles, len(points))
+        #the triangles don't go round the vertices in order, so start from all of them
+        maxX = max(p.x for p in points)
+        minY = min(p.y for p in points)
+    
+    #draw the diagonals
+    animations=[rc.addStepLine(points[diagonals[0][0]], points[diagonals[0][1]], i_start)]
+    for i, j in diagonals[1:]:
+        animations.append(rc.addStepLine(points[i], points[j], animations[-1].i_max+1))
+    
+    #the diagonals create triangles. Construct square with same area as each triangle
+    lineTransforms = []
+    squares = []
+    for a, b, c in triangles:
+        triangle = rc.addStepPolygon([points[a],points[b],points[c]], (0,0.45,0.7,1), False, animations[-1].i_max+1,1)
+        triangle.setStyle(rc.Style(stdFaceColour=(0.84,0.37,0,1),stdLineStyle='-'))
+        triangle.hide = True
+        animations.append(triangle)
+        triangleIndex=len(animations)-1
+        square = squareTriangle(points[a], points[b], points[c], animations[-1].i_max+1)
+        animations.extend(square[0])
+        animations[triangleIndex].frameToHide=animations[-1].i_max
+        #save details of the first line of the square just created
+        lineTransforms.append(rc.LineTransform(square[1][0], square[1][1]))
+        squares.append(square[1])
+        if (points[c].x > maxX):
+            maxX = points[c].x
+        if (points[c].y < minY):
+            minY = points[c].y
+        for i in range(1,3):
+            if (square[1][i].x > maxX):
+                maxX = square[1][i].x
+    
+    #now use the edges of the squares that we've saved, and Pythagoras' theorem, to calculate the length of the final square
+    if (combine=='tree'):
+        combined = combineSquaresTree(animations, lineTransforms, squares, maxX, minY)
+    else:
+        combined = combineSquaresChain(animations, lineTransforms, squares, maxX, minY)
+    finalSquareP1, finalSquareP2, finalSquareLength, finalSquareAngle, step1EndIndex, stepsUsedAtEnd = combined
     finalSquareP3 = rc.extendLineAngle(finalSquareP2, finalSquareLength, finalSquareAngle+90)
     finalSquareP4 = rc.extendLineAngle(finalSquareP1, finalSquareLength, finalSquareAngle+90)
     
@@ -410,3 +620,62 @@ def squarePolygon(*points, i_start):
             a.frameToHide = lastFrame 
       
     return [animations, [finalSquareP1,finalSquareP2,finalSquareP3,finalSquareP4]]
+
+#squarePolygon, combining the squares of the triangles in a balanced tree
+def squarePolygonTree(*points, i_start):
+    return squarePolygon(*points, i_start=i_start, combine='tree')
+
+#The constructions that cachedConstruction can build, by name
+constructions = {'squareRectangle': squareRectangle, 'squareTriangle': squareTriangle, 'squarePolygon': squarePolygon,
+                 'squarePolygonTree': squarePolygonTree}
+
+#Folder the constructions built by cachedConstruction are saved in
+cacheFolder = os.path.join(os.path.expanduser('~'), '.cache', 'RulerCompassAnimations')
+
+#Hash of the code of the libraries, so that cached constructions are rebuilt when it changes
+sourceHash = None
+
+#The name of the cache file for a construction: a hash of everything that affects it
+def cacheKey(type, points, i_start):
+    global sourceHash
+    if (sourceHash is None):
+        code = hashlib.sha256()
+        for filename in (rc.__file__, Triangulation.__file__, __file__):
+            with open(filename, 'rb') as f:
+                code.update(f.read())
+        sourceHash = code.hexdigest()
+    key = {'type': type, 'points': rc.plainValue(points), 'i_start': i_start, 'speed': rc.speed,
+           'version': rc.timelineVersion, 'source': sourceHash}
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+#Build the construction called type ('squareRectangle', 'squareTriangle', 'squarePolygon' or
+#'squarePolygonTree')
+#for points, starting at frame i_start, or load it if the same construction has been built
+#before. Constructions are saved in folder, defaulting to cacheFolder
+#Returns the same as the construction: a list of the animations and a list of the points of
+#the square
+def cachedConstruction(type, points, i_start, folder=None):
+    if (type not in constructions):
+        raise ValueError('Unknown construction type '+str(type))
+    if (folder is None):
+        folder = cacheFolder
+    filename = os.path.join(folder, cacheKey(type, points, i_start)+'.json')
+
+    if (os.path.exists(filename)):
+        with open(filename) as f:
+            data = json.load(f)
+        return [rc.timelineFromData(data['timeline']), [rc.Point(*p) for p in data['square']]]
+
+    if (type in ('squarePolygon', 'squarePolygonTree')):
+        square = constructions[type](*points, i_start=i_start)
+    else:
+        square = constructions[type](*points, i_start)
+
+    #write to a temporary file first, so that another process never reads half a file
+    os.makedirs(folder, exist_ok=True)
+    data = {'timeline': rc.timelineData(square[0]), 'square': rc.plainValue(square[1])}
+    handle, temporary = tempfile.mkstemp(dir=folder, suffix='.tmp')
+    with os.fdopen(handle, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(temporary, filename)
+    return square
@@ -0,0 +1,283 @@
+"""
+Triangulation
+Split a simple polygon, convex or not, into triangles, so that SquarePolygons
+can construct a square for each of them.
+
+Copyright (C) 2019 Sam Hartburn
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+author: Sam Hartburn
+email: sam@samhartburn.co.uk
+website: www.samhartburn.co.uk
+"""
+
+"""
+triangulate uses ear clipping: a corner of the polygon whose triangle has no
+other vertex in it (an ear) is cut off, until only one triangle is left.
+Only the vertices that aren't convex can be in a corner's triangle, so they
+are kept in a grid, and checking a corner only looks at the grid cells its
+triangle covers. Cutting off an ear only changes the corners either side of
+it, so only those two are checked again, and the ears are kept in a heap so
+that the smallest is always cut off next. For polygons whose vertices are
+spread out evenly each check looks at a few cells, so splitting a polygon
+takes about n log n time for n vertices; validatePolygon uses a grid of the
+sides in the same way. Polygons with many long, spiky sides close together
+take longer, as every check covers many cells.
+Points are anything with x and y, such as RulerCompassAnimations.Point.
+"""
+
+import math
+import heapq
+
+#Twice the area of the triangle a, b, c (given as coordinates): positive if they go
+#anticlockwise, negative if they go clockwise and 0 if they're in a line
+def cross(ax, ay, bx, by, cx, cy):
+    return (bx-ax)*(cy-ay)-(by-ay)*(cx-ax)
+
+#Twice the area of the polygon: positive if the points go anticlockwise
+def signedArea(points):
+    return math.fsum(points[i-1].x*points[i].y-points[i].x*points[i-1].y for i in range(len(points)))
+
+#True if the polygon is convex, going round once. A convex polygon can be split into triangles
+#by joining its first vertex to all the others
+def isConvex(points):
+    turns = 0
+    sign = 0
+    for i in range(len(points)):
+        a, b, c = points[i-2], points[i-1], points[i]
+        turn = cross(a.x, a.y, b.x, b.y, c.x, c.y)
+        if (turn!=0):
+            if (sign!=0 and (turn>0)!=(sign>0)):
+                return False
+            sign = turn
+        turns += math.atan2(turn, (b.x-a.x)*(c.x-b.x)+(b.y-a.y)*(c.y-b.y))
+    return sign!=0 and abs(abs(turns)-2*math.pi)<1e-6
+
+#Uniform grid of square cells of side size over a rectangle, to find what is near a point
+#without looking at everything. Each item is added to every cell its bounding box covers
+class Grid:
+    def __init__(self, minX, minY, maxX, maxY, size):
+        self.minX = minX
+        self.minY = minY
+        self.size = size
+        self.columns = max(1, int(math.ceil((maxX-minX)/size)))
+        self.rows = max(1, int(math.ceil((maxY-minY)/size)))
+        #the items in each cell, row by row, or None for a cell that has never had any
+        self.contents = [None]*(self.columns*self.rows)
+
+    #The range of columns and rows covered by a bounding box
+    def span(self, minX, minY, maxX, maxY):
+        return (range(max(0, min(int((minX-self.minX)/self.size), self.columns-1)),
+                      max(0, min(int((maxX-self.minX)/self.size), self.columns-1))+1),
+                range(max(0, min(int((minY-self.minY)/self.size), self.rows-1)),
+                      max(0, min(int((maxY-self.minY)/self.size), self.rows-1))+1))
+
+    def add(self, item, minX, minY, maxX, maxY):
+        columns, rows = self.span(minX, minY, maxX, maxY)
+        for row in rows:
+            for column in columns:
+                cell = row*self.columns+column
+                if (self.contents[cell] is None):
+                    self.contents[cell] = set()
+                self.contents[cell].add(item)
+
+    def remove(self, item, minX, minY, maxX, maxY):
+        columns, rows = self.span(minX, minY, maxX, maxY)
+        for row in rows:
+            for column in columns:
+                self.contents[row*self.columns+column].discard(item)
+
+    #Every item in the cells a bounding box covers. An item can be given more than once
+    def find(self, minX, minY, maxX, maxY):
+        columns, rows = self.span(minX, minY, maxX, maxY)
+        for row in rows:
+            for cell in self.contents[row*self.columns+columns.start:row*self.columns+columns.stop]:
+                if (cell):
+                    yield from cell
+
+#Side of the cells of a grid over the bounding box of points with about one cell for each of
+#count items, but no smaller than minimum
+def cellSize(points, count, minimum=0):
+    width = max(p.x for p in points)-min(p.x for p in points)
+    height = max(p.y for p in points)-min(p.y for p in points)
+    return max(math.sqrt(width*height/count), minimum) or 1.0
+
+#True if the line segments from p1 to p2 and from q1 to q2 cross or touch
+def segmentsTouch(p1, p2, q1, q2):
+    d1 = cross(p1.x, p1.y, p2.x, p2.y, q1.x, q1.y)
+    d2 = cross(p1.x, p1.y, p2.x, p2.y, q2.x, q2.y)
+    d3 = cross(q1.x, q1.y, q2.x, q2.y, p1.x, p1.y)
+    d4 = cross(q1.x, q1.y, q2.x, q2.y, p2.x, p2.y)
+    if (((d1>0 and d2<0) or (d1<0 and d2>0)) and ((d3>0 and d4<0) or (d3<0 and d4>0))):
+        return True
+    #a point in line with the other segment touches it if it's within the segment's bounding box
+    def within(a, b, c):
+        return min(a.x, b.x)<=c.x<=max(a.x, b.x) and min(a.y, b.y)<=c.y<=max(a.y, b.y)
+    return ((d1==0 and within(p1, p2, q1)) or (d2==0 and within(p1, p2, q2)) or
+            (d3==0 and within(q1, q2, p1)) or (d4==0 and within(q1, q2, p2)))
+
+#Check that points make a simple polygon: at least 3 points, none repeated, some area and no
+#sides that cross or touch, other than neighbouring sides meeting at their shared vertex
+#Raises ValueError describing the first problem found
+def validatePolygon(points):
+    n = len(points)
+    if (n<3):
+        raise ValueError('A polygon needs at least 3 points, not '+str(n))
+    seen = {}
+    for i, p in enumerate(points):
+        if ((p.x, p.y) in seen):
+            raise ValueError('Points '+str(seen[(p.x, p.y)])+' and '+str(i)+' of the polygon are the same')
+        seen[(p.x, p.y)] = i
+    if (signedArea(points)==0):
+        raise ValueError('The polygon has no area')
+
+    #side i goes from point i to point i+1. Only sides in the same grid cell can touch. The cells
+    #are about as big as the sides, so that each side is only in a few of them
+    meanSide = math.fsum(math.hypot(points[i].x-points[i-1].x, points[i].y-points[i-1].y) for i in range(n))/n
+    grid = Grid(min(p.x for p in points), min(p.y for p in points), max(p.x for p in points), max(p.y for p in points),
+                cellSize(points, 4*n, meanSide))
+    for i in range(n):
+        p, q = points[i], points[(i+1)%n]
+        grid.add(i, min(p.x, q.x), min(p.y, q.y), max(p.x, q.x), max(p.y, q.y))
+    checked = set()
+    for sides in grid.contents:
+        if (sides is None):
+            continue
+        sides = sorted(sides)
+        for index, i in enumerate(sides):
+            for j in sides[index+1:]:
+                if ((i, j) in checked):
+                    continue
+                checked.add((i, j))
+                if (j==i+1 or (i==0 and j==n-1)):
+                    #neighbouring sides only overlap if the second one goes back along the first
+                    a, b = (i, j) if j==i+1 else (j, i)
+                    p, v, q = points[a], points[(a+1)%n], points[(b+1)%n]
+                    overlap = (cross(p.x, p.y, v.x, v.y, q.x, q.y)==0 and
+                               (p.x-v.x)*(q.x-v.x)+(p.y-v.y)*(q.y-v.y)>0)
+                else:
+                    overlap = segmentsTouch(points[i], points[(i+1)%n], points[j], points[(j+1)%n])
+                if (overlap):
+                    raise ValueError('Sides '+str(i)+' and '+str(j)+' of the polygon cross')
+
+#Split the simple polygon with vertices points into triangles
+#If validate is True, the polygon is checked with validatePolygon first
+#Returns a list of the triangles, each a tuple of three indices in points going the same way
+#round as the polygon. Vertices in line with their neighbours aren't needed and can be left out
+def triangulate(points, validate=True):
+    if (validate):
+        validatePolygon(points)
+    n = len(points)
+    xs = [p.x for p in points]
+    ys = [p.y for p in points]
+    #go round anticlockwise, whichever way the points go
+    anticlockwise = signedArea(points)>0
+    following = [(i+1)%n for i in range(n)]
+    preceding = [(i-1)%n for i in range(n)]
+    if (not anticlockwise):
+        following, preceding = preceding, following
+
+    def turn(i):
+        a, c = preceding[i], following[i]
+        return cross(xs[a], ys[a], xs[i], ys[i], xs[c], ys[c])
+
+    #the vertices that aren't convex, which are the only ones that can be inside a corner
+    grid = Grid(min(xs), min(ys), max(xs), max(ys), cellSize(points, n))
+    blocking = [False]*n
+    for i in range(n):
+        if (turn(i)<=0):
+            blocking[i] = True
+            grid.add(i, xs[i], ys[i], xs[i], ys[i])
+
+    #True if the corner at b can be cut off: it's convex, with no vertex in its triangle or on its
+    #edges, or it's in line with its neighbours
+    def isEar(b):
+        t = turn(b)
+        if (t<=0):
+            return t==0
+        a, c = preceding[b], following[b]
+        ax, ay, bx, by, cx, cy = xs[a], ys[a], xs[b], ys[b], xs[c], ys[c]
+        for i in grid.find(min(ax, bx, cx), min(ay, by, cy), max(ax, bx, cx), max(ay, by, cy)):
+            if (i!=a and i!=b and i!=c and cross(ax, ay, bx, by, xs[i], ys[i])>=0 and
+                cross(bx, by, cx, cy, xs[i], ys[i])>=0 and cross(cx, cy, ax, ay, xs[i], ys[i])>=0):
+                return False
+        return True
+
+    #a vertex that stops blocking once its neighbours change is taken out of the grid
+    def update(i):
+        if (blocking[i] and turn(i)>0):
+            blocking[i] = False
+            grid.remove(i, xs[i], ys[i], xs[i], ys[i])
+
+    #the width plus height of the corner's triangle. Cutting off the smallest ears first keeps
+    #the triangles small, so that each check only looks at a few grid cells; cutting off the ears
+    #next to each other in turn would make a fan of long triangles covering most of the grid
+    def size(b):
+        a, c = preceding[b], following[b]
+        return max(xs[a], xs[b], xs[c])-min(xs[a], xs[b], xs[c])+max(ys[a], ys[b], ys[c])-min(ys[a], ys[b], ys[c])
+
+    #ears are kept in the heap as (size, vertex, version), where version counts how many times
+    #the vertex's neighbours had changed when it was added. An ear stays an ear until they change
+    #again, as vertices only ever stop blocking
+    triangles = []
+    removed = [False]*n
+    version = [0]*n
+    remaining = n
+    ears = [(size(i), i, 0) for i in range(n) if isEar(i)]
+    heapq.heapify(ears)
+    while (remaining>3):
+        if (len(ears)==0):
+            #cutting off ears can make other corners into ears too, without them being checked
+            ears = [(size(i), i, version[i]) for i in range(n) if not removed[i] and isEar(i)]
+            heapq.heapify(ears)
+            if (len(ears)==0):
+                raise ValueError('The polygon could not be split into triangles')
+        earSize, vertex, added = heapq.heappop(ears)
+        if (removed[vertex] or added!=version[vertex]):
+            continue
+        #cut the corner off. A vertex in line with its neighbours is cut off without a triangle
+        a, c = preceding[vertex], following[vertex]
+        if (turn(vertex)>0):
+            triangles.append((a, vertex, c) if anticlockwise else (c, vertex, a))
+        elif (blocking[vertex]):
+            blocking[vertex] = False
+            grid.remove(vertex, xs[vertex], ys[vertex], xs[vertex], ys[vertex])
+        following[a] = c
+        preceding[c] = a
+        removed[vertex] = True
+        remaining -= 1
+        update(a)
+        update(c)
+        for i in (a, c):
+            version[i] += 1
+            if (isEar(i)):
+                heapq.heappush(ears, (size(i), i, version[i]))
+
+    vertex = next(i for i in range(n) if not removed[i])
+    a, c = preceding[vertex], following[vertex]
+    if (turn(vertex)!=0):
+        triangles.append((a, vertex, c) if anticlockwise else (c, vertex, a))
+    return triangles
+
+#The sides of triangles that aren't sides of the polygon with n vertices, each once, as pairs
+#of indices in the order they're first used
+def diagonals(triangles, n):
+    found = {}
+    for triangle in triangles:
+        for i in range(3):
+            a, b = triangle[i], triangle[(i+1)%3]
+            if ((a-b)%n not in (1, n-1)):
+                found.setdefault((min(a, b), max(a, b)), None)
+    return list(found)
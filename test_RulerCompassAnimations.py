@@ -0,0 +1,83 @@
+"""
+test_RulerCompassAnimations
+Checks of the timelines RulerCompassAnimations makes, run with pytest.
+
+Copyright (C) 2019 Sam Hartburn
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+author: Sam Hartburn
+email: sam@samhartburn.co.uk
+website: www.samhartburn.co.uk
+"""
+
+import numpy as np
+import pytest
+import RulerCompassAnimations as rc
+import SquarePolygons as poly
+
+pentagon = [(0,0), (3,0), (3.93,2.85), (1.5,4.62), (-0.93,2.85)]
+
+#The steps of the construction squarePolygon makes for points, each once, in its own scene
+def steps(points):
+    points = [rc.Point(x, y) for x, y in points]
+    animations = rc.Scene().build(poly.squarePolygon, *points, i_start=1)[0]
+    return list({id(a): a for a in animations}.values())
+
+#Every frame on which something happens to steps, in the same order each time
+def eventFrames(steps):
+    return np.array([[a.i_min, a.i_max, a.frameToHide, a.frameToUnemphasise] for a in steps]).flatten()
+
+#Fitting a timeline into a budget with room for it mustn't move a step onto the frame of the one
+#before, or hide or unemphasise a step on a different frame relative to the others
+@pytest.mark.parametrize('settings', [
+    dict(maxFrames=300),
+    dict(maxFrames=2000, minFrames=3),
+    dict(duration=200, fps=5),
+])
+def testFitKeepsOrder(settings):
+    fitted = steps(pentagon)
+    before = eventFrames(fitted)
+    frames = max(a.i_max for a in fitted)+1
+    rc.fitTimeline(fitted, **settings)
+    after = eventFrames(fitted)
+    used = before>=0
+    assert np.array_equal(after>=0, used)
+    before, after = before[used], after[used]
+    assert np.array_equal(np.sign(np.subtract.outer(after, after)), np.sign(np.subtract.outer(before, before)))
+    assert all(a.frames>=settings.get('minFrames', 1) for a in fitted if a.frames>0)
+    if ('maxFrames' in settings):
+        assert max(a.i_max for a in fitted)+1 == min(settings['maxFrames'], frames)
+
+#A step given its own matplotlib Arc is drawn and bounded the same as one the scene makes
+@pytest.mark.parametrize('pooled', [False, True])
+def testOwnArc(pooled):
+    from matplotlib import patches as pat
+    made = rc.Scene(pooled=pooled)
+    madeStep = made.add(rc.Animatable('arc', None, 0, 90, 1, 2))
+    madeStep.centre = (1, 2)
+    madeStep.rotation = 30
+    own = rc.Scene(pooled=pooled)
+    arc = pat.Arc((1, 2), 4, 4, angle=30, theta1=0, theta2=0)
+    own.ax.add_patch(arc)
+    ownStep = own.add(rc.Animatable('arc', arc, 0, 90, 1, 2))
+    madeSchedule = rc.Schedule([madeStep])
+    ownSchedule = rc.Schedule([ownStep])
+    for frame in (1, 2, ownStep.i_max):
+        rc.animate(frame, [madeStep], madeSchedule)
+        rc.animate(frame, [ownStep], ownSchedule)
+        assert (arc.theta1, arc.theta2) == pytest.approx((madeStep.obj.theta1, madeStep.obj.theta2))
+    assert ownStep.obj is arc
+    assert own.ax.get_xlim() == pytest.approx(made.ax.get_xlim())
+    assert own.ax.get_ylim() == pytest.approx(made.ax.get_ylim())
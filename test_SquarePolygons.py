@@ -0,0 +1,50 @@
+"""
+test_SquarePolygons
+Checks of the squares SquarePolygons constructs, run with pytest.
+
+Copyright (C) 2019 Sam Hartburn
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+author: Sam Hartburn
+email: sam@samhartburn.co.uk
+website: www.samhartburn.co.uk
+"""
+
+import pytest
+import RulerCompassAnimations as rc
+import SquarePolygons as poly
+
+#The corners of the final square squarePolygon constructs for points, in its own scene
+def finalSquare(points, combine='chain'):
+    points = [rc.Point(x, y) for x, y in points]
+    square = rc.Scene().build(poly.squarePolygon, *points, i_start=1, combine=combine)[1]
+    return [(p.x, p.y) for p in square]
+
+def area(square):
+    (x1, y1), (x2, y2) = square[0], square[1]
+    return (x2-x1)**2+(y2-y1)**2
+
+#A vertex in the middle of a side doesn't make a triangle, so it mustn't change which side of
+#the last edge the final square is put on
+@pytest.mark.parametrize('combine', ['chain', 'tree'])
+@pytest.mark.parametrize('outline, straight', [
+    ([(0,0),(4,0),(4,4),(2,1),(0,4)], [(0,0),(2,0),(4,0),(4,4),(2,1),(0,4)]),
+    ([(0,0),(4,0),(4,4),(0,4)], [(0,0),(2,0),(4,0),(4,4),(0,4)]),
+    ([(0,0),(4,0),(0,3)], [(0,0),(2,0),(4,0),(0,3)]),
+])
+def testCollinearVertex(outline, straight, combine):
+    square = finalSquare(outline, combine)
+    assert finalSquare(straight, combine) == pytest.approx(square)
+    assert area(square) == pytest.approx(abs(poly.Triangulation.signedArea([rc.Point(x, y) for x, y in outline]))/2)